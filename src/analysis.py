@@ -0,0 +1,144 @@
+import argparse
+import glob
+import json
+import os
+from collections import defaultdict
+
+# 結果フォルダ内のレコードのファイル名
+RESULT_FILE_PATTERN = "*.jsonl"
+# 出力するパーセンタイル
+PERCENTILES = (50, 90, 99)
+
+
+class Analyzer:
+    '''
+    トラフィックごとの結果のレコードを1件ずつ受け取り、1回の走査で集計する
+    '''
+
+    def __init__(self):
+        '''
+        初期化
+        '''
+        # 種別 → 結果 → 件数
+        self.counts = defaultdict(lambda: defaultdict(int))
+        # 成功した他トラフィックの合計転送量（Mbit）と合計通信時間（秒）
+        self.other_mbit = 0
+        self.other_duration = 0
+        # 種別 → 成功したトラフィックの転送速度（Mbps）のリスト
+        self.rates = defaultdict(list)
+        # 種別 → フローのアップデートにかかった時間（秒）のリスト
+        self.setup_latencies = defaultdict(list)
+        # ビデオストリームのjitter（ms）と損失率（%）のリスト
+        self.jitters = []
+        self.losses = []
+        # (node1, node2) → {"traffic": 件数, "bytes": 転送量}
+        self.links = defaultdict(lambda: {"traffic": 0, "bytes": 0})
+
+    def add(self, record):
+        '''
+        レコードを1件集計する
+        '''
+        traffic_type = record["type"]
+        self.counts[traffic_type][record["result"]] += 1
+        if record.get("setup_latency") is not None:
+            self.setup_latencies[traffic_type].append(record["setup_latency"])
+        if record["result"] != "success":
+            return
+        self.rates[traffic_type].append(record["rate"])
+        if traffic_type == "other":
+            self.other_mbit += record["bytes"] * 8 / 1024 / 1024
+            self.other_duration += record["duration"]
+        if record.get("jitter") is not None:
+            self.jitters.append(record["jitter"])
+        if record.get("loss") is not None:
+            self.losses.append(record["loss"])
+        path = record.get("path") or []
+        for i in range(len(path) - 1):
+            link = self.links[(path[i], path[i + 1])]
+            link["traffic"] += 1
+            link["bytes"] += record["bytes"]
+
+    def add_file(self, path):
+        '''
+        JSON Linesのファイルを1行ずつ読み込んで集計する
+        '''
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    self.add(json.loads(line))
+
+    def summary(self, top_links=10):
+        '''
+        集計結果を取得する
+        failed_video_rate / failed_other_rate / other_traffic_rateはanalysis.shと同じ指標
+        top_links: 転送量の多い順に出力するリンクの数
+        '''
+        links = sorted(self.links.items(), key=lambda x: x[1]["bytes"], reverse=True)[:top_links]
+        return {
+            "count": {traffic_type: dict(results) for traffic_type, results in self.counts.items()},
+            "failed_video_rate": self.__failed_rate("video"),
+            "failed_other_rate": self.__failed_rate("other"),
+            "other_traffic_rate": self.other_mbit / self.other_duration if self.other_duration else 0,
+            "rate": {traffic_type: percentiles(rates) for traffic_type, rates in self.rates.items()},
+            "setup_latency": {traffic_type: percentiles(values) for traffic_type, values in self.setup_latencies.items()},
+            "video_jitter": percentiles(self.jitters),
+            "video_loss": percentiles(self.losses),
+            "links": [{"link": list(link), **stats} for link, stats in links]
+        }
+
+    def __failed_rate(self, traffic_type):
+        results = self.counts.get(traffic_type, {})
+        total = sum(results.values())
+        return results.get("fail", 0) / total * 100 if total else 0
+
+
+def percentiles(values):
+    '''
+    値のリストの平均とPERCENTILESのパーセンタイル（最近傍法）を取得する
+    '''
+    if not values:
+        return None
+    values = sorted(values)
+    result = {"mean": sum(values) / len(values)}
+    for p in PERCENTILES:
+        result[f"p{p}"] = values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))]
+    return result
+
+
+def analyze(paths):
+    '''
+    結果フォルダまたはレコードのファイルのリストを集計する
+    '''
+    analyzer = Analyzer()
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, RESULT_FILE_PATTERN))) if os.path.isdir(path) else [path]
+        for file in files:
+            analyzer.add_file(file)
+    return analyzer
+
+
+if '__main__' == __name__:
+
+    parser = argparse.ArgumentParser(description="シミュレーションの結果の集計")
+    parser.add_argument("paths", nargs="+", help="結果フォルダまたはレコードのファイル")
+    parser.add_argument("--json", action="store_true", help="集計結果をjsonで出力する")
+    args = parser.parse_args()
+
+    summary = analyze(args.paths).summary()
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"ビデオ棄却率：{summary['failed_video_rate']:.3f} %")
+        print(f"他トラフィック棄却率：{summary['failed_other_rate']:.3f} %")
+        print(f"他トラフィック平均通信速度：{summary['other_traffic_rate']:.3f} Mbps")
+        for traffic_type, stats in summary["rate"].items():
+            if stats:
+                print(f"{traffic_type}通信速度（Mbps）：" + ", ".join(f"{k}={v:.3f}" for k, v in stats.items()))
+        for traffic_type, stats in summary["setup_latency"].items():
+            if stats:
+                print(f"{traffic_type}フロー登録時間（秒）：" + ", ".join(f"{k}={v:.3f}" for k, v in stats.items()))
+        if summary["video_loss"]:
+            print("ビデオ損失率（%）：" + ", ".join(f"{k}={v:.3f}" for k, v in summary["video_loss"].items()))
+            print("ビデオjitter（ms）：" + ", ".join(f"{k}={v:.3f}" for k, v in summary["video_jitter"].items()))
+        for link in summary["links"]:
+            print(f"リンク {link['link'][0]}→{link['link'][1]}：{link['traffic']} トラフィック, {link['bytes'] / 1024 / 1024:.1f} MB")
@@ -0,0 +1,418 @@
+import argparse
+import json
+import logging
+import os
+import random
+import time
+from types import SimpleNamespace
+
+# neo4jを使用せず、インメモリのトポロジグラフのみで経路選択する
+os.environ.setdefault("NEO4J_MIRROR", "0")
+# テレメトリログは書き込まない（コントローラーのimport時に読み込まれる）
+os.environ["TELEMETRY_LOG"] = ""
+
+from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+
+import controller
+from controller import OpenflowController
+from definitions.topology import load_topology
+from engine.flow_cookie import FlowCookie
+from engine.metrics import REGISTRY
+from engine.reroute_planner import PathSelectAlgorithm
+from offline_simulation import OfflineSimulation
+from workload import Workload
+
+# 計測するトポロジの既定値
+TOPOLOGIES = [
+    "default",
+    "fat_tree:k=4",
+    "fat_tree:k=8",
+    "leaf_spine:spines=4,leaves=32,hosts_per_leaf=4",
+    "waxman:switches=200,seed=1"
+]
+# 統計情報の応答の送信回数
+STATS_ROUNDS = 20
+# フローアップデートのリクエスト数
+FLOW_UPDATES = 200
+# ビデオトラフィックの計測時のリンクの使用帯域（Mbps）。切り替え先のパスが残るよう最低保障帯域に余裕を持たせる
+BASE_UTILIZATION = 30
+# 切り替えを発生させるために設定するリンクの使用帯域（Mbps）と、設定する他トラフィックのパスの割合
+LOADED_UTILIZATION = 85
+LOADED_FRACTION = 0.25
+# オフラインシミュレーションで通信を行うトラフィック数と、トラフィックの平均発生間隔（秒）
+OFFLINE_TRAFFIC = 3000
+OFFLINE_INTER_ARRIVAL = 0.3
+# オフラインシミュレーションで1秒あたりに処理するトラフィックの発生要求（スキップしたものを含む）の下限
+OFFLINE_MIN_ARRIVALS_PER_SEC = 1000
+
+
+class FakeDatapath:
+    '''
+    Switchの代わりにコントローラーから送信されたメッセージを記録するdatapath
+    barrierのリクエストにはすぐに応答する
+    '''
+
+    def __init__(self, dpid, on_barrier):
+        '''
+        初期化
+        on_barrier: barrierのリクエストを受信した時に(datapath, xid)で呼び出す関数
+        '''
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.on_barrier = on_barrier
+        self.xid = 0
+        self.sent = []
+        self.flow_mods = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg):
+        '''
+        メッセージを実際のSwitchと同様にシリアライズして記録する
+        '''
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        self.sent.append(msg)
+        if isinstance(msg, ofproto_v1_3_parser.OFPFlowMod):
+            self.flow_mods += 1
+        elif isinstance(msg, ofproto_v1_3_parser.OFPBarrierRequest):
+            self.on_barrier(self, msg.xid)
+
+
+class FakeWSGI:
+    '''
+    REST APIを登録しないWSGIApplicationの代わり
+    '''
+
+    def register(self, controller_class, data):
+        pass
+
+
+class ControllerBenchmark:
+    '''
+    Mininetや実際のSwitchを使用せずにOpenflowControllerの処理時間を計測する
+    '''
+
+    def __init__(self, topology_spec, seed=0):
+        '''
+        初期化
+        topology_spec: definitions.topologyのload_topologyに渡すトポロジの指定
+        '''
+        self.topology_spec = topology_spec
+        self.random = random.Random(seed)
+        # コントローラーは環境変数TOPOLOGYからトポロジを読み込む
+        os.environ["TOPOLOGY"] = topology_spec
+        self.definition = load_topology(topology_spec)
+        # メトリクスはプロセス全体で共有されるため、前のトポロジの計測の値を消す
+        REGISTRY.reset()
+        self.app = OpenflowController(dpset=None, wsgi=FakeWSGI())
+        self.datapaths = {
+            int(switch["name"][1:]): FakeDatapath(int(switch["name"][1:]), self.app.path_installer.barrier_reply)
+            for switch in self.definition.switches
+        }
+        # スイッチごとのポート番号のリスト
+        self.ports = {}
+        for link in self.definition.links:
+            for name, port in ((link[0], link[1]), (link[2], link[3])):
+                if self.definition.is_switch(name):
+                    self.ports.setdefault(name, []).append(int(port))
+        # ポート・フローの統計情報のカウンタ
+        self.port_counters = {}
+        self.flow_counters = {}
+        self.clock = 0
+
+    def run(self, stats_rounds=STATS_ROUNDS, flow_updates=FLOW_UPDATES, offline_traffic=OFFLINE_TRAFFIC):
+        '''
+        全ての計測を実行し、結果を取得する
+        '''
+        results = {
+            "initial_setup_flow_table": self.bench_initial_setup(),
+            "port_stats_reply": self.bench_port_stats(stats_rounds),
+            "update_flow_table_other": self.bench_update_other(flow_updates),
+            "flow_stats_reply": self.bench_flow_stats(stats_rounds),
+            "update_flow_table_video": self.bench_update_video(flow_updates)
+        }
+        self.close()
+        if offline_traffic:
+            results["offline_simulation"] = self.bench_offline_simulation(offline_traffic)
+        return {
+            "topology": self.topology_spec,
+            "switches": len(self.definition.switches),
+            "hosts": len(self.definition.hosts),
+            "links": len(self.definition.links),
+            "results": results
+        }
+
+    def bench_initial_setup(self):
+        '''
+        SwitchFeaturesの処理（宛先hostごとの初期フローの登録）の時間を計測する
+        '''
+        timings = []
+        for datapath in self.datapaths.values():
+            ev = SimpleNamespace(msg=SimpleNamespace(datapath=datapath))
+            started = time.perf_counter()
+            self.app.switch_features_handler(ev)
+            timings.append(time.perf_counter() - started)
+            # 統計情報の取得対象として登録
+            self.app._state_change_handler(SimpleNamespace(datapath=datapath, state=MAIN_DISPATCHER))
+        result = summarize(timings)
+        result["flow_mods"] = sum(datapath.flow_mods for datapath in self.datapaths.values())
+        return result
+
+    def bench_port_stats(self, rounds):
+        '''
+        ポート統計情報の応答の処理時間を計測する
+        '''
+        timings = []
+        entries = 0
+        for _ in range(rounds):
+            self.clock += 1
+            for name, ports in self.ports.items():
+                datapath = self.datapaths[int(name[1:])]
+                body = [self.__port_stats(name, port) for port in ports]
+                ev = SimpleNamespace(msg=SimpleNamespace(datapath=datapath, body=body))
+                started = time.perf_counter()
+                self.app._port_stats_reply_handler(ev)
+                timings.append(time.perf_counter() - started)
+                entries += len(body)
+        return summarize(timings, entries)
+
+    def bench_flow_stats(self, rounds):
+        '''
+        フロー統計情報の応答の処理時間を計測する
+        リクエストはcookieで絞り込まれるため、各Switchの応答にはそのSwitchを通る他トラフィックの送信元→宛先方向のフローのみを含める
+        '''
+        flows = {}
+        for key, nodes in self.app.other_traffic.items():
+            for node in nodes[1:-1]:
+                flows.setdefault(node, []).append((nodes[0], nodes[-1]))
+        timings = []
+        entries = 0
+        for _ in range(rounds):
+            self.clock += 1
+            for name in self.ports:
+                datapath = self.datapaths[int(name[1:])]
+                body = [self.__flow_stats(src, dst) for src, dst in flows.get(name, [])]
+                ev = SimpleNamespace(msg=SimpleNamespace(datapath=datapath, body=body))
+                started = time.perf_counter()
+                self.app._flow_stats_reply_handler(ev)
+                timings.append(time.perf_counter() - started)
+                entries += len(body)
+        return summarize(timings, entries)
+
+    def bench_update_other(self, count):
+        '''
+        他トラフィックのフローアップデートの時間を計測する
+        登録した他トラフィックは完了させずに残し、以降の計測の負荷とする
+        成功が1件もない場合は計測の条件が正しくないためRuntimeErrorを送出する
+        '''
+        timings = FlowUpdateTimings()
+        for _ in range(count):
+            src, dst = self.__pick_pair(self.definition.client, self.definition.client)
+            if f"{src}{dst}" in self.app.other_traffic:
+                continue
+            timings.run(self.app.update_flow_table, src, dst, "other")
+        if not timings.succeeded:
+            raise RuntimeError(f"no other traffic flow update succeeded: {self.topology_spec}, {timings.failure_reasons}")
+        return timings.summarize()
+
+    def bench_update_video(self, count):
+        '''
+        ビデオトラフィックのフローアップデートの時間を計測する
+        他トラフィックの一部のパスのリンクの使用帯域をLOADED_UTILIZATIONに設定し、他トラフィックの切り替えを発生させる
+        成功または切り替えが1件もない場合は計測の条件が正しくないためRuntimeErrorを送出する
+        '''
+        self.__load_other_traffic_links()
+        timings = FlowUpdateTimings()
+        reroute_attempts = 0
+        rerouted = 0
+        for _ in range(count):
+            src, dst = self.__pick_pair(self.definition.video_server, self.definition.client)
+            info = self.app.route_cache.get_path_info_list(src, dst, controller.LIMIT_VIDEO_BANDWIDTH, shortest_only=True)[0]
+            reroute = info.min_bandwidth < controller.LIMIT_VIDEO_BANDWIDTH
+            reroute_attempts += reroute
+            if timings.run(self.app.update_flow_table, src, dst, "video"):
+                rerouted += reroute
+        if not timings.succeeded or (reroute_attempts and not rerouted):
+            raise RuntimeError(f"no reroute succeeded: {self.topology_spec}, {timings.failure_reasons}")
+        result = timings.summarize()
+        result["reroute_attempts"] = reroute_attempts
+        result["rerouted"] = rerouted
+        return result
+
+    def bench_offline_simulation(self, traffic):
+        '''
+        オフラインシミュレーションの処理速度（1秒あたりに処理したトラフィックの発生要求の数）を計測する
+        処理速度がOFFLINE_MIN_ARRIVALS_PER_SECを下回る場合はRuntimeErrorを送出する
+        '''
+        workload = Workload("poisson", OFFLINE_INTER_ARRIVAL, video_server=self.definition.video_server,
+                            client=self.definition.client, seed=self.random.randrange(2 ** 32))
+        simulation = OfflineSimulation(PathSelectAlgorithm.BANDWIDTH, workload, traffic, topology=self.definition)
+        started = time.perf_counter()
+        simulation.run()
+        elapsed = time.perf_counter() - started
+        arrivals_per_sec = len(simulation.offered) / elapsed
+        if arrivals_per_sec < OFFLINE_MIN_ARRIVALS_PER_SEC:
+            raise RuntimeError(f"offline simulation is too slow: {self.topology_spec}, {arrivals_per_sec:.0f} arrivals/sec")
+        return {
+            "arrivals": len(simulation.offered),
+            "traffic": len(simulation.results),
+            "total_sec": elapsed,
+            "arrivals_per_sec": arrivals_per_sec,
+            "traffic_per_sec": len(simulation.results) / elapsed
+        }
+
+    def close(self):
+        '''
+        コントローラーのスレッドを停止し、テレメトリログを閉じる
+        '''
+        hub.kill(self.app.monitor_thread)
+        hub.kill(self.app.flush_thread)
+        if self.app.telemetry:
+            self.app.telemetry.close()
+
+    def __load_other_traffic_links(self):
+        '''
+        全リンクの使用帯域をBASE_UTILIZATIONに設定し、他トラフィックのうちLOADED_FRACTIONの割合のパスの
+        Switch間のリンクのみLOADED_UTILIZATIONに設定する。他トラフィックの使用帯域も設定する
+        hostとSwitch間のリンクは切り替えで迂回できないため負荷を設定しない
+        '''
+        topology = self.app.topology
+        for node1, next_nodes in topology.adjacency.items():
+            for node2 in next_nodes:
+                topology.update_utilization(node1, node2, BASE_UTILIZATION, BASE_UTILIZATION)
+        keys = sorted(self.app.other_traffic)
+        for key in self.random.sample(keys, int(len(keys) * LOADED_FRACTION)):
+            nodes = self.app.other_traffic[key]
+            for i in range(1, len(nodes) - 2):
+                topology.update_utilization(nodes[i], nodes[i + 1], LOADED_UTILIZATION, LOADED_UTILIZATION)
+        for key in keys:
+            self.app.other_traffic_rate[key] = {"tx_rate": self.random.uniform(10, 50) * 1024 * 1024}
+        self.app.route_cache.bump_epoch()
+
+    def __pick_pair(self, senders, receivers):
+        while True:
+            src = self.definition.hosts[self.random.choice(senders)]["name"]
+            dst = self.definition.hosts[self.random.choice(receivers)]["name"]
+            if src != dst:
+                return src, dst
+
+    def __port_stats(self, switch_name, port):
+        '''
+        前回から1秒間に0〜100Mbps送受信したポート統計情報を生成する
+        '''
+        key = (switch_name, port)
+        rx_bytes, tx_bytes = self.port_counters.get(key, (0, 0))
+        rx_bytes += self.random.randrange(0, 100 * 1024 * 1024 // 8)
+        tx_bytes += self.random.randrange(0, 100 * 1024 * 1024 // 8)
+        self.port_counters[key] = (rx_bytes, tx_bytes)
+        return SimpleNamespace(port_no=port, duration_sec=self.clock, duration_nsec=0,
+                               rx_bytes=rx_bytes, tx_bytes=tx_bytes)
+
+    def __flow_stats(self, src_host, dst_host):
+        '''
+        前回から1秒間に0〜100Mbps転送した他トラフィックのフロー統計情報を生成する
+        '''
+        key = (src_host, dst_host)
+        byte_count = self.flow_counters.get(key, 0) + self.random.randrange(0, 100 * 1024 * 1024 // 8)
+        self.flow_counters[key] = byte_count
+        match = {"eth_src": self.definition.nodes[src_host]["mac"], "eth_dst": self.definition.nodes[dst_host]["mac"]}
+        cookie = self.app.flow_cookie.create(FlowCookie.OTHER, src_host, dst_host)
+        return SimpleNamespace(priority=controller.PAIR_FLOW_PRIORITY, cookie=cookie, match=match,
+                               duration_sec=self.clock, duration_nsec=0, byte_count=byte_count)
+
+
+class FlowUpdateTimings:
+    '''
+    フローアップデートの処理時間を成功と失敗に分けて記録する
+    '''
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+        # 失敗の理由 → 件数
+        self.failure_reasons = {}
+
+    def run(self, func, *args):
+        '''
+        funcを呼び出して処理時間を記録する
+        戻り値: 成功した場合はTrue
+        '''
+        started = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            self.failed.append(time.perf_counter() - started)
+            reason = getattr(e, "reason", type(e).__name__)
+            self.failure_reasons[reason] = self.failure_reasons.get(reason, 0) + 1
+            return False
+        self.succeeded.append(time.perf_counter() - started)
+        return True
+
+    def summarize(self):
+        '''
+        成功したフローアップデートの処理時間を集計し、失敗したものは"failed"に分けて含める
+        '''
+        result = summarize(self.succeeded)
+        result["failed"] = summarize(self.failed)
+        result["failed"]["reasons"] = self.failure_reasons
+        return result
+
+
+def summarize(timings, entries=None):
+    '''
+    処理時間（秒）のリストを集計する
+    entries: 処理したエントリ数。指定した場合は1秒あたりの処理数を含める
+    '''
+    total = sum(timings)
+    values = sorted(timings)
+    result = {
+        "count": len(values),
+        "total_sec": total,
+        "mean_ms": total / len(values) * 1000 if values else 0,
+        "p50_ms": values[len(values) // 2] * 1000 if values else 0,
+        "p99_ms": values[min(len(values) - 1, len(values) * 99 // 100)] * 1000 if values else 0,
+        "per_sec": len(values) / total if total else 0
+    }
+    if entries is not None:
+        result["entries"] = entries
+        result["entries_per_sec"] = entries / total if total else 0
+    return result
+
+
+if '__main__' == __name__:
+
+    parser = argparse.ArgumentParser(description="Mininetを使用しないコントローラーのベンチマーク")
+    parser.add_argument("--topology", action="append", default=None,
+                        help="計測するトポロジの指定（複数指定可）。省略した場合はTOPOLOGIESの全て")
+    parser.add_argument("--stats-rounds", type=int, default=STATS_ROUNDS, help="統計情報の応答の送信回数")
+    parser.add_argument("--flow-updates", type=int, default=FLOW_UPDATES, help="フローアップデートのリクエスト数")
+    parser.add_argument("--offline-traffic", type=int, default=OFFLINE_TRAFFIC,
+                        help="オフラインシミュレーションのトラフィック数（0の場合は計測しない）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="結果を書き込むjsonファイル（省略した場合は標準出力）")
+    parser.add_argument("--debug-log", action="store_true", help="コントローラーのdebugログを出力する")
+    args = parser.parse_args()
+
+    if not args.debug_log:
+        logging.getLogger("logger").setLevel(logging.WARNING)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": [
+            ControllerBenchmark(spec, args.seed).run(args.stats_rounds, args.flow_updates, args.offline_traffic)
+            for spec in (args.topology or TOPOLOGIES)
+        ]
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -1,7 +1,7 @@
 import json
 import os
 import re
-from decimal import Decimal
+import time
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, DEAD_DISPATCHER
@@ -15,13 +15,20 @@ from ryu.controller import dpset
 from webob import Response
 
 from facade.route_facade import RouteFacade
+from engine.flow_cookie import FlowCookie
+from engine.metrics import CONTENT_TYPE, REGISTRY
+from engine.path_installer import BarrierTimeoutError, PathInstaller
+from engine.rate_estimator import RateEstimator
+from engine.reroute_planner import PathSelectAlgorithm, ReroutePlanner
+from engine.route_cache import RouteCache
+from engine.telemetry_log import KIND_FLOW, KIND_PORT, TelemetryLog
+from engine.stats_scheduler import StatsScheduler
+from engine.topology_graph import TopologyGraph
+from engine.topology_index import TopologyIndex
 
 from operator import attrgetter
 
-from definitions.host import HOST_LIST
-from definitions.network import LINK
-
-from enum import Enum
+from definitions.topology import load_topology
 
 import logging
 
@@ -42,21 +49,119 @@ video_url = '/controller/video/flowtable'
 other_traffic_url = '/controller/other/flowtable'
 get_other_traffic = '/controller/other/flowtable'
 other_traffic_complete_url = '/controller/other/complete'
+video_complete_url = '/controller/video/complete'
+route_cache_url = '/controller/route/cache'
+batch_url = '/controller/flowtable/batch'
+stats_schedule_url = '/controller/stats/schedule'
+metrics_url = '/controller/metrics'
+topology_reload_url = '/controller/topology/reload'
 
 # ビデオストリームと他トラフィックの最低保障帯域（ＭＢ）
 LIMIT_VIDEO_BANDWIDTH = 20
 LIMIT_OTHER_BANDWIDTH = 20
 
-class PathSelectAlgorithm(Enum):
+# 他トラフィックの候補パス数（k-shortest paths）とホップ数の上限（Noneの場合は制限なし）
+K_SHORTEST_PATHS = 8
+MAX_HOP_COUNT = None
+# 候補パスをキャッシュするsrc・dstの組の最大数
+ROUTE_CACHE_SIZE = 1024
+
+# 宛先ごとの初期フロー（eth_dstのみでマッチ）と、送信元・宛先ペアごとのフローの優先度
+DEFAULT_FLOW_PRIORITY = 1
+PAIR_FLOW_PRIORITY = 2
+
+# パスのフロー登録時にbarrierの応答を待つ時間（秒）
+BARRIER_TIMEOUT = 5
+# Switchごとのフロー登録をOpenFlow 1.3のbundleでまとめて適用するか
+USE_FLOW_BUNDLE = False
+# パスのフロー登録をSwitchごとにbarrierの応答を待ってから順に送信するか
+# Falseの場合も、入口のSwitchへの送信は出口側・経由するSwitchのbarrierの応答を待ってから行う
+STRICT_FLOW_ORDER = False
+
+# パスのフロー登録のphase（出口側・経由するSwitch、入口のSwitch、切り替え前のパスのフローの削除の順に適用する）
+PHASE_TRANSIT = 0
+PHASE_ENTRY = 1
+PHASE_CLEANUP = 2
+
+# 統計情報のリクエスト間隔（秒）。Switchのリンクの空き帯域に応じてMIN〜MAXの間で調整する
+STATS_INTERVAL = 10
+MIN_STATS_INTERVAL = 2
+MAX_STATS_INTERVAL = 30
+
+# 統計情報からの使用帯域の推定方法（"ewma"または"window"）・保持する区間の数・EWMAの新しい区間の重み
+RATE_ESTIMATOR_MODE = "ewma"
+RATE_WINDOW = 4
+RATE_EWMA_ALPHA = 0.5
+
+# ポート・フローの使用帯域を記録するテレメトリログのディレクトリ（環境変数TELEMETRY_LOG。未設定の場合は記録しない）
+TELEMETRY_LOG_DIR = os.getenv("TELEMETRY_LOG")
+# テレメトリログの1ファイルのサイズ（バイト）。超えた場合は次のファイルにローテーションする
+TELEMETRY_FILE_SIZE = 64 * 1024 * 1024
+
+# neo4jへの使用帯域情報の書き込み間隔（秒）
+NEO4J_FLUSH_INTERVAL = 30
+
+PATH_SELECT_ALGORITHM = PathSelectAlgorithm.BANDWIDTH
+# PathSelectAlgorithm.OPTIMIZATIONの計算時間の上限（秒）と、超えた場合に使用するアルゴリズム
+REROUTE_OPTIMIZATION_TIMEOUT = 0.5
+REROUTE_FALLBACK_ALGORITHM = PathSelectAlgorithm.BANDWIDTH
+# PathSelectAlgorithm.OPTIMIZATIONで切り替えの候補とする他トラフィックの数の上限
+REROUTE_MAX_CANDIDATES = 32
+
+
+class AdmissionError(Exception):
     '''
-    切り替えアルゴリズム用Enumクラス
+    トラフィックのフローを登録できない場合に送出する
+    reason: メトリクスに記録する理由
     '''
-    NO_CHANGE: int = 0
-    SHORTEST_PATH: int = 1
-    LONGEST_PATH: int = 2
-    BANDWIDTH: int = 3
- 
-PATH_SELECT_ALGORITHM = PathSelectAlgorithm.BANDWIDTH
+
+    def __init__(self, reason, message=None):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class PendingFlowUpdate:
+    '''
+    一括のフローアップデートで送信を保留しているphaseごとのフロー登録と、トラフィック情報の変更の記録
+    呼び出しごとに作成して引数で渡すため、処理がyieldしている間の他のリクエストの変更とは混ざらない
+    '''
+    # 変更前にキーが登録されていなかったことを表す値
+    MISSING = object()
+
+    def __init__(self):
+        self.phases = [[], [], []]
+        # (dict, キー, 変更前の値, 変更後の値)のリスト
+        self.changes = []
+
+    def set(self, table, key, value):
+        '''
+        tableのキーに値を設定し、変更を記録する
+        '''
+        self.changes.append((table, key, table.get(key, self.MISSING), value))
+        table[key] = value
+
+    def merge(self, other):
+        '''
+        otherのフロー登録と変更の記録を追加する
+        '''
+        for phase, steps in zip(self.phases, other.phases):
+            phase.extend(steps)
+        self.changes.extend(other.changes)
+
+    def rollback(self):
+        '''
+        記録した変更を新しい順に戻す
+        変更後に他のリクエストで変更・削除されたキーは戻さない
+        '''
+        for table, key, old, new in reversed(self.changes):
+            if table.get(key, self.MISSING) is not new:
+                continue
+            if old is self.MISSING:
+                del table[key]
+            else:
+                table[key] = old
+        self.changes = []
+
 
 class OpenflowController(app_manager.RyuApp):
     '''
@@ -75,16 +180,92 @@ class OpenflowController(app_manager.RyuApp):
         super().__init__(*args, **kwargs)
         self.mac_to_port = {}
         self.datapaths = {}
-        self.stats_info = {}
         self.dpset = kwargs['dpset']
+        # 統計情報のリクエストのスケジュール
+        self.stats_scheduler = StatsScheduler(STATS_INTERVAL, MIN_STATS_INTERVAL, MAX_STATS_INTERVAL)
         self.monitor_thread = hub.spawn(self._monitor)
         self.other_traffic = {}
-        self.flow_stats_info = {}
         self.other_traffic_rate = {}
+        # (送信元, 宛先) → (cookieの種別, パス)。フローを登録している全てのトラフィック
+        self.installed_paths = {}
+        # ポート（受信・送信）と他トラフィックのフローの使用帯域の推定
+        self.port_rates = RateEstimator(2, RATE_WINDOW, RATE_ESTIMATOR_MODE, RATE_EWMA_ALPHA)
+        self.flow_rates = RateEstimator(1, RATE_WINDOW, RATE_ESTIMATOR_MODE, RATE_EWMA_ALPHA)
+        # 推定した使用帯域の記録
+        self.telemetry = TelemetryLog(TELEMETRY_LOG_DIR, TELEMETRY_FILE_SIZE) if TELEMETRY_LOG_DIR else None
+        # ポート・隣接node・MACアドレス・datapathのO(1)参照用インデックス（reload_topologyで構築する）
+        self.topology_index = TopologyIndex([], [])
+        # パス単位のフロー登録
+        self.path_installer = PathInstaller(BARRIER_TIMEOUT, USE_FLOW_BUNDLE, STRICT_FLOW_ORDER)
+        # 環境変数TOPOLOGYで指定されたトポロジ（sim_topology.pyと同じ値で起動する）を読み込む
+        self.reload_topology()
+        # neo4jへの書き込み待ちの使用帯域情報（リンクごとに最新の値のみ保持）
+        self.pending_bandwidth_usage = {}
+        self.flush_thread = hub.spawn(self._flush_bandwidth_usage_monitor)
+        # /controller/metricsで出力するメトリクス
+        self.update_latency = REGISTRY.histogram(
+            "controller_update_flow_table_duration_seconds", "Duration of update_flow_table", ["type"])
+        self.stats_latency = REGISTRY.histogram(
+            "controller_stats_reply_duration_seconds", "Duration of stats reply processing", ["kind"])
+        self.stats_errors = REGISTRY.counter(
+            "controller_stats_reply_errors_total", "Stats replies that could not be processed", ["kind"])
+        self.flow_mods = REGISTRY.counter(
+            "controller_flow_mods_total", "Flow mods sent to switches", ["priority"])
+        self.reroutes = REGISTRY.counter(
+            "controller_reroutes_total", "Reroutes of other traffic triggered by video traffic", ["algorithm"])
+        self.rerouted_traffic = REGISTRY.counter(
+            "controller_rerouted_traffic_total", "Other traffic selected to be rerouted")
+        self.admission_failures = REGISTRY.counter(
+            "controller_admission_failures_total", "Flow updates that failed", ["type", "reason"])
+        REGISTRY.gauge("controller_other_traffic", "Other traffic currently registered",
+                       lambda: len(self.other_traffic))
         wsgi = kwargs['wsgi']
         wsgi.register(RestController,
                       {controller_instance_name: self})
 
+    def reload_topology(self, spec=None):
+        '''
+        トポロジの定義を読み込み、パス検索・フロー登録に使用する情報を作り直す
+        spec: definitions.topologyのload_topologyに渡すトポロジの指定（Noneの場合は環境変数TOPOLOGY）
+        接続済みのSwitchから登録済みのフローを全て削除し、登録中のトラフィック情報を削除してから初期フローを登録し直す
+        '''
+        definition = load_topology(spec)
+        # hostの番号が変わるとcookieが別のトラフィックを指すため、読み込み前のトポロジで登録したフローを残さない
+        self.__delete_installed_flows()
+        self.definition = definition
+        # パス検索に使用するインメモリのトポロジグラフ
+        self.topology = TopologyGraph(self.definition.links, self.definition.switch_names)
+        # 候補パスのキャッシュ
+        self.route_cache = RouteCache(self.topology, K_SHORTEST_PATHS, MAX_HOP_COUNT, ROUTE_CACHE_SIZE)
+        # ポート・隣接node・MACアドレスの参照用インデックス（datapathの情報は保持する）
+        self.topology_index.build(self.definition.links, self.definition.hosts)
+        # フローの種別とトラフィックを表すcookie
+        self.flow_cookie = FlowCookie(self.definition.hosts)
+        # 全Switchから各hostへの最短パス上の次のnode
+        self.next_hop_table = self.topology.get_next_hop_table([host["name"] for host in self.definition.hosts])
+        # 切り替える他トラフィックの決定
+        self.reroute_planner = ReroutePlanner(self.topology, LIMIT_VIDEO_BANDWIDTH, LIMIT_OTHER_BANDWIDTH,
+                                              K_SHORTEST_PATHS, MAX_HOP_COUNT,
+                                              REROUTE_OPTIMIZATION_TIMEOUT, REROUTE_FALLBACK_ALGORITHM,
+                                              REROUTE_MAX_CANDIDATES, lambda: hub.sleep(0))
+        self.other_traffic.clear()
+        self.other_traffic_rate.clear()
+        self.installed_paths.clear()
+        for datapath in list(self.datapaths.values()):
+            self.__initial_setup_flow_table(datapath)
+
+    def __delete_installed_flows(self):
+        '''
+        接続済みの全Switchから初期フロー・ビデオ・他トラフィックのフローをcookieの種別で削除し、barrierの応答を待つ
+        '''
+        steps = []
+        for datapath in list(self.datapaths.values()):
+            mods = [self.create_flow_delete(datapath, *FlowCookie.get_class_filter(traffic_class))
+                    for traffic_class in (FlowCookie.DEFAULT, FlowCookie.VIDEO, FlowCookie.OTHER)]
+            steps.append((datapath, mods))
+        if steps:
+            self.path_installer.install([steps])
+
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
         '''
@@ -92,8 +273,7 @@ class OpenflowController(app_manager.RyuApp):
         各スイッチに最短パスのフローを登録する
         '''
         datapath = ev.msg.datapath
-        self.stats_info[str(datapath.id)] = {}
-        self.flow_stats_info[str(datapath.id)] = {}
+        self.topology_index.register_datapath(datapath)
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
@@ -102,48 +282,58 @@ class OpenflowController(app_manager.RyuApp):
     def __initial_setup_flow_table(self, datapath):
         '''
         datapathに対応するスイッチに初期フロー（最短パス）を登録する
+        宛先hostごとにeth_dstのみでマッチする低優先度のフローを1つ登録する
         '''
         switch_name = f"s{datapath.id}"
         parser = datapath.ofproto_parser
-        for host in HOST_LIST:
-            # スイッチからhostへの最短パスを取得
-            shortest_path = RouteFacade.get_shortest_path("switch", switch_name, "host", host["name"])
-            # 最短パスから次のnodeを取得し、そのnodeがつながるポートを取得
-            m = re.search(r'^ \((s[\w]*)\)[^(]*\(([sh][\w]*)\).*', shortest_path)
-            next_node_name = m.group(2)
-            out_port = self.__get_ports(next_node_name, switch_name)
-            # 各hostを送信元とするフローを登録
+        for host in self.definition.hosts:
+            # スイッチからhostへの最短パス上の次のnodeを取得し、そのnodeがつながるポートを取得
+            next_node_name = self.next_hop_table[host["name"]].get(switch_name)
+            if next_node_name is None:
+                continue
+            out_port, _ = self.topology_index.get_port(switch_name, next_node_name)
+            # hostを宛先とするフローを登録
             actions = [parser.OFPActionOutput(int(out_port))]
-            for src_host in HOST_LIST:
-                if src_host == host:
-                    continue
-                match = parser.OFPMatch(eth_src=src_host["mac"], eth_dst=host["mac"])
-                self.add_flow(datapath, 1, match, actions)
-                
-    def __get_ports(self, dst_node, switch):
+            match = parser.OFPMatch(eth_dst=host["mac"])
+            cookie = self.flow_cookie.create(FlowCookie.DEFAULT, dst_host=host["name"])
+            self.add_flow(datapath, DEFAULT_FLOW_PRIORITY, match, actions, cookie)
+
+    def add_flow(self, datapath, priority, match, actions, cookie=0):
         '''
-        Switchのあるnodeがつながるportを取得
+        datapathに対応するSwitchにフローを登録する
         '''
-        for li in LINK:
-            if li[0] == dst_node and li[2] == switch:
-                out_port = li[3]
-            elif li[2] == dst_node and li[0] == switch:
-                out_port = li[1]
-        return out_port
+        datapath.send_msg(self.create_flow_mod(datapath, priority, match, actions, cookie))
+        self.flow_mods.inc(priority="default" if priority == DEFAULT_FLOW_PRIORITY else "pair")
 
-    def add_flow(self, datapath, priority, match, actions):
+    def create_flow_mod(self, datapath, priority, match, actions, cookie=0):
         '''
-        datapathに対応するSwitchにフローを登録する
+        datapathに対応するSwitchへのフロー登録メッセージを生成する
         '''
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # construct flow_mod message and send it.
+        # construct flow_mod message.
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS,
                                              actions)]
-        mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                match=match, instructions=inst)
-        datapath.send_msg(mod)
+        return parser.OFPFlowMod(datapath=datapath, cookie=cookie, priority=priority,
+                                 match=match, instructions=inst)
+
+    def create_flow_delete(self, datapath, cookie, cookie_mask):
+        '''
+        datapathに対応するSwitchからcookieが一致するフローを削除するメッセージを生成する
+        '''
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        return parser.OFPFlowMod(datapath=datapath, cookie=cookie, cookie_mask=cookie_mask,
+                                 table_id=ofproto.OFPTT_ALL, command=ofproto.OFPFC_DELETE,
+                                 out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def _barrier_reply_handler(self, ev):
+        '''
+        Switchから受信したbarrierの応答の処理
+        '''
+        self.path_installer.barrier_reply(ev.msg.datapath, ev.msg.xid)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def _packet_in_handler(self, ev):
@@ -160,20 +350,55 @@ class OpenflowController(app_manager.RyuApp):
             if datapath.id not in self.datapaths:
                 logger.debug('register datapath: %016x', datapath.id)
                 self.datapaths[datapath.id] = datapath
+                self.topology_index.register_datapath(datapath)
+                self.stats_scheduler.add(datapath.id, time.monotonic())
         elif ev.state == DEAD_DISPATCHER:
             if datapath.id in self.datapaths:
                 logger.debug('unregister datapath: %016x', datapath.id)
                 del self.datapaths[datapath.id]
+                self.topology_index.unregister_datapath(datapath.id)
+                self.stats_scheduler.remove(datapath.id)
 
     def _monitor(self):
         '''
         トラフィックをモニターする
-        モニター間隔は10秒
+        各Switchへのリクエストは間隔内で均等にずらし、間隔はリンクの空き帯域に応じて調整する
+        '''
+        while True:
+            for dpid in self.stats_scheduler.get_due(time.monotonic()):
+                dp = self.datapaths.get(dpid)
+                if dp:
+                    self._request_stats(dp)
+            hub.sleep(self.stats_scheduler.get_sleep_time(time.monotonic()))
+
+    def _flush_bandwidth_usage_monitor(self):
+        '''
+        書き込み待ちの使用帯域情報を定期的にneo4jに書き込む
+        書き込み間隔はNEO4J_FLUSH_INTERVAL秒
         '''
         while True:
-            for dp in self.datapaths.values():
-                self._request_stats(dp)
-            hub.sleep(10)
+            hub.sleep(NEO4J_FLUSH_INTERVAL)
+            self.__flush_bandwidth_usage()
+
+    def __flush_bandwidth_usage(self):
+        '''
+        書き込み待ちの使用帯域情報をまとめてneo4jに書き込む
+        '''
+        pending, self.pending_bandwidth_usage = self.pending_bandwidth_usage, {}
+        if not pending:
+            return
+        try:
+            RouteFacade.update_bandwitdh_usage(list(pending.values()))
+        except Exception as e:
+            logger.error(f"failed to flush bandwidth usage: {e}")
+
+    def close(self):
+        '''
+        コントローラー終了時に書き込み待ちの使用帯域情報をneo4jに書き込み、テレメトリログを閉じる
+        '''
+        self.__flush_bandwidth_usage()
+        if self.telemetry:
+            self.telemetry.close()
 
     def _request_stats(self, datapath):
         '''
@@ -184,7 +409,9 @@ class OpenflowController(app_manager.RyuApp):
         parser = datapath.ofproto_parser
 
         # フロー統計情報をリクエスト
-        req = parser.OFPFlowStatsRequest(datapath)
+        # 他トラフィックの送信元→宛先方向のフローのみをcookieで絞り込み、応答を発生中のトラフィック数に比例させる
+        cookie, cookie_mask = self.flow_cookie.get_stats_filter(FlowCookie.OTHER)
+        req = parser.OFPFlowStatsRequest(datapath, cookie=cookie, cookie_mask=cookie_mask)
         datapath.send_msg(req)
 
         # ポート統計情報をリクエスト
@@ -198,45 +425,44 @@ class OpenflowController(app_manager.RyuApp):
         '''
         body = ev.msg.body
         dpid = ev.msg.datapath.id
-        for stat in body:
-            if stat.priority != 1:
-                raise Exception("stats monitor error")
-            self.__update_flow_stats_info(dpid, stat)
+        with self.stats_latency.time(kind="flow"):
+            for stat in body:
+                # リクエストをcookieで絞り込んでいるため、他トラフィック以外のフローは含まれない
+                if self.flow_cookie.get_class(stat.cookie) != FlowCookie.OTHER:
+                    self.stats_errors.inc(kind="flow")
+                    raise Exception("stats monitor error")
+                self.__update_flow_stats_info(dpid, stat)
 
     def __update_flow_stats_info(self, dpid, stat):
         '''
         フロー統計情報を元に以下をアップデート
-        self.flow_stats_info：各Switchのフロー統計情報
+        self.flow_rates：他トラフィックのフローの使用帯域の推定
         self.other_traffic_rate：他トラフィックの使用帯域情報
+        他トラフィック情報のキーはフローのcookieから取得する
         '''
-        src_mac = stat.match['eth_src']
-        dst_mac = stat.match['eth_dst']
-        src_host = list(filter(lambda x: x["mac"] == src_mac, HOST_LIST))[0]["name"]
-        dst_host = list(filter(lambda x: x["mac"] == dst_mac, HOST_LIST))[0]["name"]
-        duration_sec = stat.duration_sec
-        duration_nsec = stat.duration_nsec
-        tx_bytes = stat.byte_count
-        flow_info = self.flow_stats_info.get(str(dpid), {}).get(f"{src_host}{dst_host}", {})
-        sec = (stat.duration_sec + stat.duration_nsec / 10**9) - flow_info.get("duration", 0)
-        tx_bytes_of_this_duration = tx_bytes - flow_info.get("tx_bytes", 0)
-        tx_rate = tx_bytes_of_this_duration * 8 / sec
-        # 各Switchのフロー統計情報を更新
-        self.flow_stats_info[str(dpid)].update(
-                {
-                f"{src_host}{dst_host}": {
-                    'duration': stat.duration_sec + stat.duration_nsec / 10**9,
-                    'tx_bytes': tx_bytes
-                }
-            }
-        )
+        key = self.flow_cookie.get_key(stat.cookie)
+        if key is None:
+            return
         # self.other_trafficにデータがない場合は、現在発生しているトラフィックではないのでself.other_traffic_rateから情報を消す
-        if not self.other_traffic.get(f"{src_host}{dst_host}"):
-            self.other_traffic_rate.pop(f"{src_host}{dst_host}", None)
-            return 
+        nodes = self.other_traffic.get(key)
+        if not nodes:
+            self.other_traffic_rate.pop(key, None)
+            self.flow_rates.remove(key)
+            return
+        # 使用帯域はパスの入口のSwitchの値を使用する（切り替え前のパスに残ったフローの値は使用しない）
+        if nodes[1] != f"s{dpid}":
+            return
+        rates = self.flow_rates.add(key, stat.duration_sec + stat.duration_nsec / 10**9, (stat.byte_count,))
+        # 最初のサンプルは区間がないため使用帯域を更新しない
+        if rates is None:
+            return
         # 他トラフィックの使用帯域情報を更新
-        self.other_traffic_rate[f"{src_host}{dst_host}"] = {
-            'tx_rate': tx_rate
+        self.other_traffic_rate[key] = {
+            'tx_rate': rates[0],
+            'peak_tx_rate': self.flow_rates.get_peak(key)[0]
         }
+        if self.telemetry:
+            self.telemetry.append(time.time(), dpid, stat.cookie, KIND_FLOW, 0, rates[0])
 
     @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
     def _port_stats_reply_handler(self, ev):
@@ -246,268 +472,316 @@ class OpenflowController(app_manager.RyuApp):
         body = ev.msg.body
         dpid = ev.msg.datapath.id
 
-        for stat in sorted(body, key=attrgetter('port_no')):
-            # ポート統計情報の更新
-            port_no, rx_rate, tx_rate = self.__update_stats_info(dpid, stat)
-            # neo4jの情報を更新
-            self.__update_bandwitdh_usage(switch_name=f's{dpid}', port=str(port_no), rx_rate=rx_rate, tx_rate=tx_rate)
+        with self.stats_latency.time(kind="port"):
+            for stat in sorted(body, key=attrgetter('port_no')):
+                # ポート統計情報の更新
+                port_no, rx_rate, tx_rate = self.__update_stats_info(dpid, stat)
+                # 最初のサンプルは区間がないため使用帯域を更新しない
+                if rx_rate is None:
+                    continue
+                if self.telemetry:
+                    self.telemetry.append(time.time(), dpid, port_no, KIND_PORT, rx_rate, tx_rate)
+                # 使用帯域情報の更新
+                self.__update_bandwitdh_usage(switch_name=f's{dpid}', port=str(port_no), rx_rate=rx_rate, tx_rate=tx_rate)
+            # 使用帯域に依存するパスの評価を無効にする
+            self.route_cache.bump_epoch()
+            # 応答までの時間を記録し、リンクの空き帯域に応じてリクエスト間隔を調整
+            self.stats_scheduler.reply_received(dpid, time.monotonic())
+            headroom = self.topology.get_min_headroom(f's{dpid}')
+            self.stats_scheduler.update_interval(dpid, headroom, LIMIT_VIDEO_BANDWIDTH, self.topology.bandwidth)
 
     def __update_stats_info(self, dpid, stat):
         '''
         ポート統計情報を元に以下をアップデート
-        self.stats_info：各Switchのポート統計情報
+        self.port_rates：各Switchのポートの使用帯域の推定
+        戻り値: (ポート番号, 受信の使用帯域, 送信の使用帯域)。最初のサンプルの場合は使用帯域がNone
         '''
         port_no = stat.port_no
-        duration_sec = stat.duration_sec
-        duration_nsec = stat.duration_nsec
-        rx_bytes = stat.rx_bytes
-        tx_bytes = stat.tx_bytes
-        port_info = self.stats_info.get(str(dpid), {}).get(str(port_no), {})
-        sec = (stat.duration_sec + stat.duration_nsec / 10**9) - port_info.get("duration", 0)
-        rx_bytes_of_this_duration = rx_bytes - port_info.get("rx_bytes", 0)
-        tx_bytes_of_this_duration = tx_bytes - port_info.get("tx_bytes", 0)
-        rx_rate = rx_bytes_of_this_duration * 8 / sec
-        tx_rate = tx_bytes_of_this_duration * 8 / sec
-        # 各Switchのポート統計情報を更新
-        self.stats_info[str(dpid)].update(
-                {
-                str(port_no): {
-                    'duration': stat.duration_sec + stat.duration_nsec / 10**9,
-                    'rx_bytes': rx_bytes,
-                    'tx_bytes': tx_bytes
-                }
-            }
-        )
+        rates = self.port_rates.add((dpid, port_no), stat.duration_sec + stat.duration_nsec / 10**9,
+                                    (stat.rx_bytes, stat.tx_bytes))
+        if rates is None:
+            return port_no, None, None
+        rx_rate, tx_rate = rates
         return port_no, rx_rate, tx_rate
 
     def __update_bandwitdh_usage(self, switch_name, port, tx_rate, rx_rate):
         '''
-        ポート統計情報を元にneo4jの情報をアップデート
+        ポート統計情報を元にトポロジグラフの使用帯域情報をアップデート
+        経路選択はトポロジグラフの情報を使用し、neo4jへは書き込み待ちとして登録してまとめて書き込む
         '''
-        connected_node = None
         # Switchの該当ポートに接続されているnodeを検索
-        for li in LINK:
-            if li[0] == switch_name and li[1] == port:
-                connected_node = li[2]
-            elif li[2] == switch_name and li[3] == port:
-                connected_node = li[0]
+        connected_node = self.topology_index.get_neighbor(switch_name, port)
 
         # Switchの該当ポートに接続されているnodeがなければreturn
         if not connected_node:
             return
 
-        # neo4jで管理している各リンクの使用帯域情報をアップデート
-        RouteFacade.update_bandwitdh_usage(switch_name, connected_node, port, tx_rate, rx_rate)
+        # インメモリのトポロジグラフの使用帯域情報をアップデート
+        self.topology.update_utilization(switch_name, connected_node, tx_rate / 1024 / 1024, rx_rate / 1024 / 1024)
+        # neo4jで管理している各リンクの使用帯域情報（可視化用のミラー）を書き込み待ちに登録
+        link_key = tuple(sorted((switch_name, connected_node)))
+        self.pending_bandwidth_usage[link_key] = (switch_name, connected_node, tx_rate, rx_rate)
 
-    def update_flow_table(self, src_host, dst_host, traffic_type):
+    def update_flow_table(self, src_host, dst_host, traffic_type, pending=None):
         '''
         シミュレーションのスクリプトからフローアップデートをリクエストされた時に実行されるメソッド
+        処理時間と失敗の理由をメトリクスに記録する
+        pending: 指定した場合はフロー登録を送信せずにPendingFlowUpdateに保留し、トラフィック情報の変更を記録する
+        戻り値: フローを登録したパスのnode名のリスト
+        '''
+        with self.update_latency.time(type=traffic_type):
+            try:
+                return self.__update_flow_table(src_host, dst_host, traffic_type, pending)
+            except Exception as e:
+                self.admission_failures.inc(type=traffic_type, reason=self.__failure_reason(e))
+                raise
+
+    @staticmethod
+    def __failure_reason(e):
+        '''
+        フローアップデートの失敗の理由を取得する
+        '''
+        if isinstance(e, AdmissionError):
+            return e.reason
+        if isinstance(e, BarrierTimeoutError):
+            return "barrier_timeout"
+        return "error"
+
+    def __update_flow_table(self, src_host, dst_host, traffic_type, pending):
+        '''
+        経路を選択してフローを登録する
         '''
         # ビデオトラフィックの場合の処理
         if traffic_type == "video":
             # src_hostからdst_hostへの最短パスを取得
-            path_list = [RouteFacade.get_shortest_path("host", src_host, "host", dst_host)]
-            path_info_list = self.__parse_path_list(path_list)
+            path_info_list = self.route_cache.get_path_info_list(src_host, dst_host, LIMIT_VIDEO_BANDWIDTH, shortest_only=True)
             # フローをアップデート
-            self.__update_video_flow_table(path_info_list)
+            return self.__update_video_flow_table(path_info_list, pending)
         # 他トラフィックの場合の処理
         else:
-            # src_hostからdst_hostへの全パスを取得
-            path_list = RouteFacade.get_path_list("host", src_host, "host", dst_host)
-            path_info_list = self.__parse_path_list(path_list)
+            # src_hostからdst_hostへのパスをホップ数の小さい順に取得
+            path_info_list = self.route_cache.iter_path_info(src_host, dst_host, LIMIT_VIDEO_BANDWIDTH)
             #フローをアップデート
-            self.__update_other_flow_table(path_info_list)
-
-    def __parse_path_list(self, path_list):
-        '''
-        neo4jのパス情報から以下情報を取得
-        nodes: パスに含まれるnodeのリスト。srcからdstの順で含まれる
-        relations: node間のリンクリンク情報。使用帯域など。srcからdstの順で含まれる
-        min_bandwidth: 利用できる帯域
-        hop_count: ホップ数
-        exceeded_video_limitation_relations: ビデオの最低保証帯域を下回るリンク情報
-        '''
-        path_info_list = []
-        for path in path_list:
-            nodes = re.findall(r'\(([^)]*)\)', path)
-            relations = re.findall(r'\[([^]]*)\]', path)
-            hop_count, min_bandwidth, exceeded_video_limitation_relations = self.__create_summary_info(nodes, relations)
-            if len(nodes) == len(set(nodes)):
-                path_info_list.append({
-                    "nodes": nodes,
-                    "relations": relations,
-                    "hop_count": hop_count,
-                    "min_bandwidth": min_bandwidth,
-                    "exceeded_video_limitation_relations": exceeded_video_limitation_relations
-                })
-        return path_info_list
-
-    def __create_summary_info(self, nodes, relations):
-        '''
-        リンク情報からhop_count, min_bandwidth, exceeded_video_limitation_relationsを生成
-        '''
-        hop_count = len(nodes) - 1
-        max_rate = 0
-        exceeded_video_limitation_relations = []
-        for i, relation in enumerate(relations):
-            m = re.search(r'{(.*)}', relation)
-            raw_props = m.group(1)
-            prop_list = raw_props.split(",")
-            for prop in prop_list:
-                _key, _val = prop.split(":")
-                _key, _val = _key.strip(), _val.strip()
-                if _key == f"{nodes[i]}{nodes[i + 1]}":
-                    if 100 - Decimal(_val) < LIMIT_VIDEO_BANDWIDTH:
-                        exceeded_video_limitation_relations.append(i)
-                    if max_rate < Decimal(_val):
-                        max_rate = Decimal(_val)
-        min_bandwidth = 100 - max_rate
-        return hop_count, min_bandwidth, exceeded_video_limitation_relations
-
-    def __update_video_flow_table(self, path_info_list):
+            return self.__update_other_flow_table(path_info_list, pending=pending)
+
+    def update_flow_table_batch(self, requests):
+        '''
+        シミュレーションのスクリプトから複数のフローアップデートを一括でリクエストされた時に実行されるメソッド
+        requests: {"src_host", "dst_host", "type"}のリスト
+        ビデオトラフィックを先に処理し、全てのフロー登録をSwitchごとにまとめて送信する
+        後続のリクエストの経路選択に反映するため、成功したリクエストのパスの使用帯域を見込みで加算する
+        失敗したリクエストのトラフィック情報の変更は戻し、フロー登録が完了しなかった場合はこの一括の処理での変更を全て戻す
+        戻り値: requestsと同じ順の{"result": "success" or "fail", "path": パス}のリスト
+        '''
+        results = [None] * len(requests)
+        order = sorted(range(len(requests)), key=lambda i: 0 if requests[i]["type"] == "video" else 1)
+        batch = PendingFlowUpdate()
+        reserved = []
+        for i in order:
+            request = requests[i]
+            pending = PendingFlowUpdate()
+            try:
+                nodes = self.update_flow_table(request["src_host"], request["dst_host"], request["type"], pending)
+                results[i] = {"result": "success", "path": nodes}
+                reserved.extend(self.__reserve_bandwidth(pending, request["type"], nodes))
+                batch.merge(pending)
+            except Exception as e:
+                logger.error(e)
+                results[i] = {"result": "fail"}
+                # 保留したフロー登録は送信しないため、切り替えた他トラフィックも含めて変更前に戻す
+                pending.rollback()
+        try:
+            self.path_installer.install(batch.phases, merge_by_switch=True)
+        except Exception as e:
+            logger.error(e)
+            # フロー登録が完了しなかった場合は全て失敗とし、トラフィック情報と見込みの使用帯域を戻す
+            for i, result in enumerate(results):
+                if result["result"] == "success":
+                    results[i] = {"result": "fail"}
+                    self.admission_failures.inc(type=requests[i]["type"], reason=self.__failure_reason(e))
+            batch.rollback()
+            self.__release_bandwidth(reserved)
+        return results
+
+    def __reserve_bandwidth(self, pending, traffic_type, nodes):
+        '''
+        登録したパスに最低保証帯域を加算し、切り替えた他トラフィックの使用帯域を切り替え先のパスに移す
+        pending: フローアップデートの変更を記録したPendingFlowUpdate
+        戻り値: 加算した(パス, 使用帯域)のリスト
+        '''
+        reserved = [(nodes, LIMIT_VIDEO_BANDWIDTH if traffic_type == "video" else LIMIT_OTHER_BANDWIDTH)]
+        for table, key, old_nodes, new_nodes in pending.changes:
+            if table is not self.other_traffic or old_nodes is PendingFlowUpdate.MISSING:
+                continue
+            rate = self.other_traffic_rate.get(key)
+            rate_mb = rate['tx_rate'] / 1024 / 1024 if rate else LIMIT_OTHER_BANDWIDTH
+            reserved.append((old_nodes, -rate_mb))
+            reserved.append((new_nodes, rate_mb))
+        for path, rate_mb in reserved:
+            self.topology.add_path_utilization(path, rate_mb)
+        self.route_cache.bump_epoch()
+        return reserved
+
+    def __release_bandwidth(self, reserved):
+        '''
+        __reserve_bandwidthで加算した使用帯域を戻す
+        '''
+        for path, rate_mb in reversed(reserved):
+            self.topology.add_path_utilization(path, -rate_mb)
+        self.route_cache.bump_epoch()
+
+    def __update_video_flow_table(self, path_info_list, pending=None):
         '''
         ビデオトラフィックのフロー情報更新
         '''
-        sorted_path_info_list = sorted(path_info_list, key=lambda x: x['hop_count'])
+        sorted_path_info_list = sorted(path_info_list, key=attrgetter('hop_count'))
         for info in sorted_path_info_list:
             # 最短パスの帯域が最低保証帯域を上回っている場合はそのままアップデート
-            if info["min_bandwidth"] >= LIMIT_VIDEO_BANDWIDTH:
-                self.__update(info["nodes"])
-                return
+            if info.min_bandwidth >= LIMIT_VIDEO_BANDWIDTH:
+                self.__update(info.nodes, FlowCookie.VIDEO, pending)
+                return info.nodes
              # 最短パスの帯域が最低保証帯域を下回っている場合は他トラフィックを切り替えてアップデート
             else:
-                self.__modify_other_flow_table(info)
-                self.__update(info["nodes"])
-                return
+                self.__modify_other_flow_table(info, pending)
+                self.__update(info.nodes, FlowCookie.VIDEO, pending)
+                return info.nodes
         logger.error("error in __update_video_flow_table")
-        raise Exception
+        raise AdmissionError("no_path")
 
-    def __update_other_flow_table(self, path_info_list, modify=False):
+    def __update_other_flow_table(self, path_info_list, modify=False, pending=None):
         '''
         他トラフィックのフロー情報更新
+        path_info_listはホップ数の小さい順に生成されるため、条件を満たすパスが見つかった時点で打ち切り、以降の候補パスは検索しない
         '''
-        sorted_path_info_list = sorted(path_info_list, key=lambda x: x['hop_count'])
-        for info in sorted_path_info_list:
-            nodes = info["nodes"]
+        for info in path_info_list:
             # 最短パスの帯域が最低保証帯域を上回っている場合はアップデート
-            if info["min_bandwidth"] >= LIMIT_OTHER_BANDWIDTH:
-                self.__update(info["nodes"])
-                start_node = nodes[0]
-                end_node = nodes[-1]
-                # すでにトラフィックが終了している場合はそのままreturn
-                if modify and not self.other_traffic[f"{start_node}{end_node}"]:
-                    logger.warning("already completed the traffic")
-                    return
-                # 他トラフィック情報に登録
-                self.other_traffic[f"{start_node}{end_node}"] = nodes
-                return
+            if info.min_bandwidth >= LIMIT_OTHER_BANDWIDTH:
+                self.__update_other_traffic(info.nodes, modify, pending)
+                return info.nodes
         logger.error("error found no path with enough bandwidth")
-        raise Exception
+        raise AdmissionError("reroute_no_bandwidth" if modify else "no_bandwidth")
+
+    def __update_other_traffic(self, nodes, modify=False, pending=None):
+        '''
+        他トラフィックのフローを更新し、他トラフィック情報に登録
+        切り替えの場合は、切り替え前のパスにのみ含まれるSwitchからフローを削除する
+        '''
+        start_node = nodes[0]
+        end_node = nodes[-1]
+        old_nodes = self.other_traffic.get(f"{start_node}{end_node}")
+        # すでにトラフィックが終了している場合はフローを登録せずにreturn
+        if modify and not old_nodes:
+            logger.warning("already completed the traffic")
+            return
+        self.__update(nodes, FlowCookie.OTHER, pending)
+        if old_nodes:
+            self.__delete_flows(FlowCookie.OTHER, start_node, end_node, set(old_nodes[1:-1]) - set(nodes[1:-1]), pending)
+        # 他トラフィック情報に登録
+        self.__set_traffic(self.other_traffic, f"{start_node}{end_node}", nodes, pending)
+
+    @staticmethod
+    def __set_traffic(table, key, value, pending):
+        '''
+        トラフィック情報を登録する。一括のフローアップデート中は変更をpendingに記録する
+        '''
+        if pending is not None:
+            pending.set(table, key, value)
+        else:
+            table[key] = value
+
+    def __delete_flows(self, traffic_class, src_host, dst_host, switch_names, pending=None):
+        '''
+        トラフィックの両方向のフローをcookieで指定してSwitchから削除する
+        cookieは種別・方向・送信元・宛先の全てで一致させるため、同じmatchのフローが他のトラフィック
+        （逆方向のトラフィックや同じ送信元・宛先の別の種別のトラフィック）で上書きされている場合は削除しない
+        '''
+        cookies = [self.flow_cookie.create(traffic_class, src_host, dst_host, reverse) for reverse in (False, True)]
+        steps = []
+        for switch_name in switch_names:
+            datapath = self.topology_index.get_datapath(switch_name)
+            if datapath is None:
+                continue
+            steps.append((datapath, [self.create_flow_delete(datapath, cookie, FlowCookie.FULL_MASK) for cookie in cookies]))
+        # 一括のフローアップデート中は新しいパスのフロー登録の後に送信する
+        if pending is not None:
+            pending.phases[PHASE_CLEANUP].extend(steps)
+            return
+        for datapath, mods in steps:
+            for mod in mods:
+                datapath.send_msg(mod)
 
-    def __update(self, nodes):
+    def __update(self, nodes, traffic_class, pending=None):
         '''
         各Switchにフロー情報更新をリクエスト
+        送信元・宛先ペアのフローを宛先ごとの初期フローより高い優先度で、traffic_classのcookieを付けて登録する
+        各方向とも入口以外のSwitchに送信してbarrierの応答を待ってから、入口のSwitchに送信する
+        下り方向（宛先→送信元）のフローは逆方向のトラフィックの上り方向のフローと同じmatchになるため、
+        逆方向のトラフィックが通信中の場合は登録しない（そのトラフィックの上り方向のフローを使用する）
         '''
-        src_node_mac = HOST_LIST[int(nodes[0][1:]) - 1]["mac"]
-        dst_node_mac = HOST_LIST[int(nodes[-1][1:]) - 1]["mac"]
-        for i in range(len(nodes) - 1):
-            port1, port2 = self.__get_port(nodes[i], nodes[i + 1])
-            # 上り方向のフロー更新
-            if nodes[i].startswith("s"):
-                datapath = self.__get_datapath(nodes[i])
-                ofproto = datapath.ofproto
-                parser = datapath.ofproto_parser
-                actions = [parser.OFPActionOutput(int(port1))]
-                match = parser.OFPMatch(eth_src=src_node_mac, eth_dst=dst_node_mac)
-                logger.debug(f"switch: {nodes[i]}, dpid: {datapath.id}, src: {src_node_mac}, dst: {dst_node_mac}, port: {port1}")
-                self.add_flow(datapath, 1, match, actions)
-
-            # 下り方向のフロー更新
-            if nodes[i + 1].startswith("s"):
-                datapath = self.__get_datapath(nodes[i + 1])
-                ofproto = datapath.ofproto
-                parser = datapath.ofproto_parser
-                actions = [parser.OFPActionOutput(int(port2))]
-                match = parser.OFPMatch(eth_src=dst_node_mac, eth_dst=src_node_mac)
-                logger.debug(f"switch: {nodes[i + 1]}, dpid: {datapath.id}, src: {dst_node_mac}, dst: {src_node_mac}, port: {port2}")
-                self.add_flow(datapath, 1, match, actions)
-
-    def __get_port(self, node1, node2):
-        '''
-        node1とnode2の接続ポート情報を取得
-        '''
-        for li in LINK:
-            if li[0] == node1 and li[2] == node2:
-                port1 = li[1]
-                port2 = li[3]
-                break
-            elif li[2] == node1 and li[0] == node2:
-                connected_node = li[0]
-                port1 = li[3]
-                port2 = li[1]
-                break
-        return port1, port2
-
-    def __get_datapath(self, switch_name):
-        '''
-        Switchに対応するdatapathを取得
-        '''
-        switch_id = int(switch_name[1:])
-        dp_all = self.dpset.get_all()
-        for dp in dp_all:
-            if switch_id == dp[1].id:
-                return dp[1]
-
-    def __modify_other_flow_table(self, info):
+        src_host, dst_host = nodes[0], nodes[-1]
+        self.__set_traffic(self.installed_paths, (src_host, dst_host), (traffic_class, nodes), pending)
+        upstream_steps = self.__create_path_steps(nodes, traffic_class)
+        if (dst_host, src_host) in self.installed_paths:
+            downstream_steps = []
+        else:
+            downstream_steps = self.__create_path_steps(nodes, traffic_class, reverse=True)
+        self.flow_mods.inc(len(upstream_steps) + len(downstream_steps), priority="pair")
+
+        # 各方向のstepsは出口側から並んでおり、最後が入口のSwitchとなる
+        transit_steps = upstream_steps[:-1] + downstream_steps[:-1]
+        entry_steps = upstream_steps[-1:] + downstream_steps[-1:]
+        # 一括のフローアップデート中は送信を保留する
+        if pending is not None:
+            pending.phases[PHASE_TRANSIT].extend(transit_steps)
+            pending.phases[PHASE_ENTRY].extend(entry_steps)
+            return
+        self.path_installer.install([transit_steps, entry_steps])
+
+    def __create_path_steps(self, nodes, traffic_class, reverse=False):
+        '''
+        パスの1方向のフロー登録を出口側のSwitchから入口のSwitchの順に生成する
+        reverse: 宛先→送信元方向のフローを生成するか
+        '''
+        cookie = self.flow_cookie.create(traffic_class, nodes[0], nodes[-1], reverse)
+        path = nodes[::-1] if reverse else nodes
+        eth_src = self.topology_index.host_to_mac[path[0]]
+        eth_dst = self.topology_index.host_to_mac[path[-1]]
+        steps = []
+        for i in range(1, len(path) - 1):
+            out_port, _ = self.topology_index.get_port(path[i], path[i + 1])
+            datapath = self.topology_index.get_datapath(path[i])
+            parser = datapath.ofproto_parser
+            actions = [parser.OFPActionOutput(int(out_port))]
+            match = parser.OFPMatch(eth_src=eth_src, eth_dst=eth_dst)
+            logger.debug(f"switch: {path[i]}, dpid: {datapath.id}, src: {eth_src}, dst: {eth_dst}, port: {out_port}")
+            steps.append((datapath, [self.create_flow_mod(datapath, PAIR_FLOW_PRIORITY, match, actions, cookie)]))
+        return steps[::-1]
+
+    def __modify_other_flow_table(self, info, pending=None):
         '''
         提案方式に従って、他トラフィックを選択し、フローテーブルを更新
         '''
-        change_traffic_keys = set()
-        for i in info["exceeded_video_limitation_relations"]:
-            # ビデオ最低保証帯域を満たさないパスを含む他トラフィック情報を取得
-            flg_find = 0
-            node1 = info["nodes"][i]
-            node2 = info["nodes"][i + 1]
-            other_traffic_list = [{"key": k,  "nodes": v, "num_nodes": len(v)} for k, v in  self.other_traffic.items()]
-            # 提案方式にしたがって、対象他トラフィックをソート
-            if PATH_SELECT_ALGORITHM == PathSelectAlgorithm.SHORTEST_PATH:
-                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['num_nodes'])
-            elif PATH_SELECT_ALGORITHM == PathSelectAlgorithm.LONGEST_PATH:
-                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['num_nodes'], reverse=True)
-            elif PATH_SELECT_ALGORITHM == PathSelectAlgorithm.BANDWIDTH:
-                other_traffic_list_add_rate = []
-                for traffic in other_traffic_list:
-                    tx_rate = self.other_traffic_rate.get(traffic["key"], {}).get("tx_rate", 0)
-                    other_traffic_list_add_rate.append(traffic.update({"tx_rate": tx_rate}))
-                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['tx_rate'], reverse=True)
-            elif PATH_SELECT_ALGORITHM == PathSelectAlgorithm.NO_CHANGE:
-                raise Exception("not enough bandwidth")
-            # 切り替える他トラフィックを決定
-            for traffic in sorted_other_traffic_list:
-                key = traffic["key"]
-                other_traffic_nodes = traffic["nodes"]
-                for j in range(len(other_traffic_nodes) - 1):
-                    # 他トラフィックのパスにビデオ最低保証帯域を満たさないパスが含まれていれば、切り替える他トラフィックとする
-                    if other_traffic_nodes[j] == node1 and other_traffic_nodes[j + 1] == node2:
-                        change_traffic_keys.add(key)
-                        flg_find = 1
-                        break
-                if flg_find == 1:
-                    break
+        try:
+            plan = self.reroute_planner.plan(PATH_SELECT_ALGORITHM, info, self.other_traffic, self.other_traffic_rate)
+        except Exception as e:
+            # 切り替えなし（NO_CHANGE）の場合はビデオ最低保証帯域を確保できない
+            raise AdmissionError("video_bandwidth", str(e))
+        self.reroutes.inc(algorithm=PATH_SELECT_ALGORITHM.name)
+        self.rerouted_traffic.inc(len(plan))
         # 決定した他トラフィックのフローテーブルを更新
-        for key in change_traffic_keys:
-            print("hogehoge-")
+        for key, nodes in plan:
             m = re.search(r'(h[0-9]*)(h[0-9]*)', key)
             src_node_name = m.group(1)
             dst_node_name = m.group(2)
             logger.debug(src_node_name)
             logger.debug(dst_node_name)
             logger.debug(self.other_traffic[key])
-            path_list = RouteFacade.get_path_list("host", src_node_name, "host", dst_node_name, info["nodes"])
-            print(path_list)
-            path_info_list = self.__parse_path_list(path_list)
-            self.__update_other_flow_table(path_info_list, True)
-            
+            # 切り替え先のパスが決定している場合はそのパスに更新
+            if nodes:
+                self.__update_other_traffic(nodes, True, pending)
+                continue
+            path_info_list = self.route_cache.iter_path_info(src_node_name, dst_node_name, LIMIT_VIDEO_BANDWIDTH, info.nodes)
+            self.__update_other_flow_table(path_info_list, True, pending)
 
     def get_other_traffic(self):
         '''
@@ -515,12 +789,57 @@ class OpenflowController(app_manager.RyuApp):
         '''
         return self.other_traffic
 
+    def get_route_cache_stats(self):
+        '''
+        候補パスのキャッシュのヒット・ミスの回数の取得
+        '''
+        return self.route_cache.get_stats()
+
+    def get_metrics(self):
+        '''
+        メトリクスをPrometheusのテキスト形式で取得する
+        '''
+        return REGISTRY.render()
+
+    def get_stats_schedule(self):
+        '''
+        Switchごとの統計情報のリクエスト間隔・送信の遅れ・応答までの時間の取得
+        '''
+        return self.stats_scheduler.get_status()
+
     def complete_other_traffic(self, src_host, dst_host):
         '''
         シミュレーションのスクリプトから他トラフィックの完了をリクエストされた時に実行されるメソッド
         '''
         # self.other_trafficから該当のトラフィックを削除
         del self.other_traffic[f"{src_host}{dst_host}"]
+        self.other_traffic_rate.pop(f"{src_host}{dst_host}", None)
+        self.flow_rates.remove(f"{src_host}{dst_host}")
+        # パス上のSwitchからフローを削除し、以降のフロー統計情報の対象から外す
+        self.__complete_traffic(src_host, dst_host)
+
+    def complete_video_traffic(self, src_host, dst_host):
+        '''
+        シミュレーションのスクリプトからビデオトラフィックの完了をリクエストされた時に実行されるメソッド
+        '''
+        if self.installed_paths.get((src_host, dst_host), (None,))[0] != FlowCookie.VIDEO:
+            raise KeyError(f"{src_host}{dst_host}")
+        self.__complete_traffic(src_host, dst_host)
+
+    def __complete_traffic(self, src_host, dst_host):
+        '''
+        完了したトラフィックのフローをパス上のSwitchから削除する
+        逆方向のトラフィックが通信中の場合は、登録していなかったそのトラフィックの下り方向のフローを登録する
+        '''
+        traffic_class, nodes = self.installed_paths.pop((src_host, dst_host))
+        self.__delete_flows(traffic_class, src_host, dst_host, nodes[1:-1])
+        opposite = self.installed_paths.get((dst_host, src_host))
+        if opposite is None:
+            return
+        opposite_class, opposite_nodes = opposite
+        steps = self.__create_path_steps(opposite_nodes, opposite_class, reverse=True)
+        self.flow_mods.inc(len(steps), priority="pair")
+        self.path_installer.install([steps[:-1], steps[-1:]])
 
 
 class RestController(ControllerBase):
@@ -553,8 +872,8 @@ class RestController(ControllerBase):
             raise Response(status=400)
 
         try:
-            controller_app.update_flow_table(src_host, dst_host, "other")
-            res = {"result": "success"}
+            nodes = controller_app.update_flow_table(src_host, dst_host, "other")
+            res = {"result": "success", "path": nodes}
         except Exception as e:
             logger.error(e)
             res = {"result": "fail"}
@@ -579,14 +898,41 @@ class RestController(ControllerBase):
             raise Response(status=400)
 
         try:
-            controller_app.update_flow_table(src_host, dst_host, "video")
-            res = {"result": "success"}
+            nodes = controller_app.update_flow_table(src_host, dst_host, "video")
+            res = {"result": "success", "path": nodes}
         except Exception as e:
             logger.error(e)
             res = {"result": "fail"}
         body = json.dumps(res)
         return Response(content_type='application/json', json_body=res)
 
+    @route('controller', batch_url, methods=['POST'], requirements={})
+    def update_flow_table_batch(self, req, **kwargs):
+        '''
+        複数のトラフィックのフローを一括でアップデートするためのrest api
+        '''
+
+        controller_app = self.controller_app
+
+        logger.debug(req)
+
+        try:
+            body = req.json if req.body else []
+            requests = body["requests"] if isinstance(body, dict) else body
+            requests = [
+                {"src_host": r["src_host"], "dst_host": r["dst_host"], "type": r["type"]}
+                for r in requests
+            ]
+        except (ValueError, KeyError, TypeError):
+            raise Response(status=400)
+
+        try:
+            res = {"results": controller_app.update_flow_table_batch(requests)}
+        except Exception as e:
+            logger.error(e)
+            res = {"result": "fail"}
+        return Response(content_type='application/json', json_body=res)
+
     @route('controller', other_traffic_complete_url, methods=['POST'], requirements={})
     def complete_other_traffic(self, req, **kwargs):
         '''
@@ -611,6 +957,29 @@ class RestController(ControllerBase):
         body = json.dumps(res)
         return Response(content_type='application/json', json_body=res)
 
+    @route('controller', video_complete_url, methods=['POST'], requirements={})
+    def complete_video_traffic(self, req, **kwargs):
+        '''
+        ビデオトラフィックを完了するためのrest api
+        '''
+
+        controller_app = self.controller_app
+
+        try:
+            body = req.json if req.body else {}
+            src_host = body["src_host"]
+            dst_host = body["dst_host"]
+        except ValueError:
+            raise Response(status=400)
+
+        try:
+            controller_app.complete_video_traffic(src_host, dst_host)
+            res = {"result": "success"}
+        except Exception as e:
+            logger.error(e)
+            res = {"result": "fail"}
+        return Response(content_type='application/json', json_body=res)
+
     @route('controller', get_other_traffic, methods=['GET'], requirements={})
     def get_other_traffic(self, req, **kwargs):
         '''
@@ -626,3 +995,73 @@ class RestController(ControllerBase):
             res = {"result": "fail"}
         body = json.dumps(res)
         return Response(content_type='application/json', json_body=res)
+
+    @route('controller', stats_schedule_url, methods=['GET'], requirements={})
+    def get_stats_schedule(self, req, **kwargs):
+        '''
+        統計情報のリクエストのスケジュールを取得するためのrest api
+        '''
+
+        controller_app = self.controller_app
+
+        try:
+            res = controller_app.get_stats_schedule()
+        except Exception as e:
+            logger.error(e)
+            res = {"result": "fail"}
+        return Response(content_type='application/json', json_body=res)
+
+    @route('controller', metrics_url, methods=['GET'], requirements={})
+    def get_metrics(self, req, **kwargs):
+        '''
+        メトリクスをPrometheusのテキスト形式で取得するためのrest api
+        '''
+
+        controller_app = self.controller_app
+
+        try:
+            body = controller_app.get_metrics()
+        except Exception as e:
+            logger.error(e)
+            raise Response(status=500)
+        res = Response(charset='utf-8', text=body)
+        res.headers['Content-Type'] = CONTENT_TYPE
+        return res
+
+    @route('controller', topology_reload_url, methods=['POST'], requirements={})
+    def reload_topology(self, req, **kwargs):
+        '''
+        トポロジの定義を読み込み直すためのrest api
+        bodyの"topology"でトポロジを指定できる（省略した場合は環境変数TOPOLOGY）
+        '''
+
+        controller_app = self.controller_app
+
+        try:
+            body = req.json if req.body else {}
+            spec = body.get("topology")
+        except ValueError:
+            raise Response(status=400)
+
+        try:
+            controller_app.reload_topology(spec)
+            res = {"result": "success"}
+        except Exception as e:
+            logger.error(e)
+            res = {"result": "fail"}
+        return Response(content_type='application/json', json_body=res)
+
+    @route('controller', route_cache_url, methods=['GET'], requirements={})
+    def get_route_cache_stats(self, req, **kwargs):
+        '''
+        候補パスのキャッシュのヒット・ミスの回数を取得するためのrest api
+        '''
+
+        controller_app = self.controller_app
+
+        try:
+            res = controller_app.get_route_cache_stats()
+        except Exception as e:
+            logger.error(e)
+            res = {"result": "fail"}
+        return Response(content_type='application/json', json_body=res)
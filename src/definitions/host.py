@@ -9,6 +9,6 @@ for i in range(NUM_HOST):
         {
             "name": f"h{i + 1}",
             "mac": f"{mac[0]}{mac[1]}:{mac[2]}{mac[3]}:{mac[4]}{mac[5]}:{mac[6]}{mac[7]}:{mac[8]}{mac[9]}:{mac[10]}{mac[11]}",
-            "ip": f"10.0.0.{i}"
+            "ip": f"10.0.0.{i + 1}"
         }
     )
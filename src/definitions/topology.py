@@ -0,0 +1,264 @@
+# トポロジの定義
+# 既定のトポロジ（host.py・switch.py・network.pyの定義）と、パラメータから生成するトポロジを提供する
+# 使用するトポロジは環境変数TOPOLOGYで指定する。コントローラーとsim_topology.pyは同じ値で実行すること
+# 例：export TOPOLOGY=fat_tree:k=8
+#     export TOPOLOGY=leaf_spine:spines=4,leaves=32,hosts_per_leaf=4
+#     export TOPOLOGY=ring:switches=100
+#     export TOPOLOGY=grid:rows=10,cols=10
+#     export TOPOLOGY=waxman:switches=200,alpha=0.4,beta=0.1,seed=1
+import math
+import os
+import random
+
+
+class Topology:
+    '''
+    トポロジの定義
+    links: definitions.networkのLINKと同じ形式の接続情報
+    hosts / switches: definitions.hostのHOST_LIST・definitions.switchのSWITCH_LISTと同じ形式のnode情報
+    video_server / client: ビデオサーバと他トラフィックを送信するホストのindex
+    '''
+
+    def __init__(self, links, hosts, switches, video_server=None, client=None):
+        '''
+        初期化
+        video_serverを省略した場合はホストから等間隔に2台選択し、clientを省略した場合は残りのホストとする
+        '''
+        self.links = links
+        self.hosts = hosts
+        self.switches = switches
+        if video_server is None:
+            video_server = sorted({len(hosts) * i // 2 for i in range(2)}) if len(hosts) > 2 else [0]
+        if client is None:
+            client = [i for i in range(len(hosts)) if i not in video_server]
+        self.video_server = video_server
+        self.client = client
+        # node名 → hostまたはswitchの情報
+        self.nodes = {node["name"]: node for node in hosts + switches}
+        # switchのnode名の集合
+        self.switch_names = {switch["name"] for switch in switches}
+
+    def is_switch(self, node_name):
+        '''
+        nodeがswitchかどうか
+        '''
+        return node_name in self.switch_names
+
+    def __repr__(self):
+        return f"Topology(switches={len(self.switches)}, hosts={len(self.hosts)}, links={len(self.links)})"
+
+
+class TopologyBuilder:
+    '''
+    switch・host・リンクを追加してTopologyを生成する
+    node名はswitchが"s<番号>"、hostが"h<番号>"（番号は1から）で、ポート番号はnodeごとに1から順に割り当てる
+    '''
+
+    def __init__(self):
+        '''
+        初期化
+        '''
+        self.links = []
+        self.hosts = []
+        self.switches = []
+        # node名 → 最後に割り当てたポート番号
+        self.ports = {}
+
+    def add_switch(self):
+        '''
+        switchを追加し、そのnode名を返す
+        '''
+        number = len(self.switches) + 1
+        self.switches.append({
+            "name": f"s{number}",
+            "mac": to_mac(2 ** 40 + number),
+            # hostと重ならないようMACアドレスは上位のbit、IPアドレスは10.128.0.0/9から割り当てる
+            "ip": to_ip(2 ** 23 + number)
+        })
+        return f"s{number}"
+
+    def add_host(self, switch_name):
+        '''
+        hostを追加してswitchと接続し、そのnode名を返す
+        '''
+        number = len(self.hosts) + 1
+        self.hosts.append({
+            "name": f"h{number}",
+            "mac": to_mac(number),
+            "ip": to_ip(number)
+        })
+        self.add_link(switch_name, f"h{number}")
+        return f"h{number}"
+
+    def add_link(self, node1, node2):
+        '''
+        node1とnode2を空いているポートで接続する
+        '''
+        port1 = self.ports.get(node1, 0) + 1
+        port2 = self.ports.get(node2, 0) + 1
+        self.ports[node1] = port1
+        self.ports[node2] = port2
+        self.links.append([node1, str(port1), node2, str(port2)])
+
+    def build(self, video_server=None, client=None):
+        '''
+        Topologyを生成する
+        '''
+        return Topology(self.links, self.hosts, self.switches, video_server, client)
+
+
+def to_mac(value):
+    '''
+    整数からMACアドレスを生成する
+    '''
+    mac = f"{value:012x}"
+    return ":".join(mac[i:i + 2] for i in range(0, 12, 2))
+
+
+def to_ip(value):
+    '''
+    整数から10.0.0.0/8のIPアドレスを生成する（Mininetのhostの既定のIPアドレスと同じ割り当て）
+    '''
+    return f"10.{(value >> 16) & 0xff}.{(value >> 8) & 0xff}.{value & 0xff}"
+
+
+def default():
+    '''
+    host.py・switch.py・network.pyで定義された既定のトポロジ
+    '''
+    from definitions.host import HOST_LIST
+    from definitions.network import LINK
+    from definitions.switch import SWITCH_LIST
+    return Topology(LINK, HOST_LIST, SWITCH_LIST,
+                    video_server=[0, 10], client=[1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 16, 17, 18])
+
+
+def fat_tree(k=4):
+    '''
+    kポートのswitchで構成するfat-tree
+    core (k/2)^2台、pod k個（aggregation・edge各k/2台）、edgeごとにhost k/2台
+    '''
+    if k % 2 != 0:
+        raise ValueError("k must be even")
+    half = k // 2
+    builder = TopologyBuilder()
+    core = [builder.add_switch() for _ in range(half * half)]
+    for _ in range(k):
+        aggregation = [builder.add_switch() for _ in range(half)]
+        edge = [builder.add_switch() for _ in range(half)]
+        for i, agg in enumerate(aggregation):
+            # aggregationのi番目はcoreのi番目のグループと接続
+            for j in range(half):
+                builder.add_link(agg, core[i * half + j])
+            for sw in edge:
+                builder.add_link(agg, sw)
+        for sw in edge:
+            for _ in range(half):
+                builder.add_host(sw)
+    return builder.build()
+
+
+def leaf_spine(spines=2, leaves=4, hosts_per_leaf=2):
+    '''
+    全てのleafが全てのspineと接続するleaf-spine
+    '''
+    builder = TopologyBuilder()
+    spine = [builder.add_switch() for _ in range(spines)]
+    leaf = [builder.add_switch() for _ in range(leaves)]
+    for sw in leaf:
+        for sp in spine:
+            builder.add_link(sw, sp)
+    for sw in leaf:
+        for _ in range(hosts_per_leaf):
+            builder.add_host(sw)
+    return builder.build()
+
+
+def ring(switches=8, hosts_per_switch=1):
+    '''
+    switchを環状に接続したring
+    '''
+    builder = TopologyBuilder()
+    ring_switches = [builder.add_switch() for _ in range(switches)]
+    for i in range(switches):
+        if switches > 2 or i == 0:
+            builder.add_link(ring_switches[i], ring_switches[(i + 1) % switches])
+    for sw in ring_switches:
+        for _ in range(hosts_per_switch):
+            builder.add_host(sw)
+    return builder.build()
+
+
+def grid(rows=4, cols=4, hosts_per_switch=1):
+    '''
+    switchを格子状に接続したgrid
+    '''
+    builder = TopologyBuilder()
+    grid_switches = [[builder.add_switch() for _ in range(cols)] for _ in range(rows)]
+    for r in range(rows):
+        for c in range(cols):
+            if c + 1 < cols:
+                builder.add_link(grid_switches[r][c], grid_switches[r][c + 1])
+            if r + 1 < rows:
+                builder.add_link(grid_switches[r][c], grid_switches[r + 1][c])
+    for row in grid_switches:
+        for sw in row:
+            for _ in range(hosts_per_switch):
+                builder.add_host(sw)
+    return builder.build()
+
+
+def waxman(switches=20, alpha=0.4, beta=0.1, hosts_per_switch=1, seed=0):
+    '''
+    Waxmanモデルのランダムトポロジ
+    単位正方形上に配置したswitch間を確率 beta * exp(-距離 / (alpha * 最大距離)) で接続する
+    連結にするため、各switchを先に配置したswitchのうち最も近いものと必ず接続する
+    '''
+    rng = random.Random(seed)
+    builder = TopologyBuilder()
+    names = [builder.add_switch() for _ in range(switches)]
+    points = [(rng.random(), rng.random()) for _ in range(switches)]
+    max_distance = math.sqrt(2)
+    connected = set()
+    for i in range(1, switches):
+        j = min(range(i), key=lambda j: math.dist(points[i], points[j]))
+        connected.add((j, i))
+    for i in range(switches):
+        for j in range(i + 1, switches):
+            if (i, j) in connected:
+                continue
+            if rng.random() < beta * math.exp(-math.dist(points[i], points[j]) / (alpha * max_distance)):
+                connected.add((i, j))
+    for i, j in sorted(connected):
+        builder.add_link(names[i], names[j])
+    for sw in names:
+        for _ in range(hosts_per_switch):
+            builder.add_host(sw)
+    return builder.build()
+
+
+GENERATORS = {
+    "default": default,
+    "fat_tree": fat_tree,
+    "leaf_spine": leaf_spine,
+    "ring": ring,
+    "grid": grid,
+    "waxman": waxman
+}
+
+
+def load_topology(spec=None):
+    '''
+    "名前:パラメータ=値,..." の形式の指定からトポロジを生成する
+    specを省略した場合は環境変数TOPOLOGY（未設定の場合はdefault）を使用する
+    '''
+    if spec is None:
+        spec = os.getenv("TOPOLOGY", "default")
+    name, _, params = spec.partition(":")
+    if name not in GENERATORS:
+        raise ValueError(f"unknown topology: {name}")
+    kwargs = {}
+    for param in filter(None, params.split(",")):
+        key, _, value = param.partition("=")
+        kwargs[key.strip()] = float(value) if "." in value else int(value)
+    return GENERATORS[name](**kwargs)
@@ -0,0 +1,149 @@
+import numpy as np
+
+# 数値誤差の許容値
+EPS = 1e-9
+
+
+def solve_relaxation(costs, coverage, demands):
+    '''
+    被覆問題のLP緩和を単体法（Blandの規則）で解く
+    min costs・x  s.t. coverage x >= demands, 0 <= x <= 1
+    costs: 変数ごとのコスト（長さn）
+    coverage: 要求ごと・変数ごとの被覆量（m×n）
+    demands: 要求量（長さm）
+    戻り値: 最適解xのnumpy配列。実行可能解がない場合はNone
+    '''
+    costs = np.asarray(costs, dtype=float)
+    demands = np.asarray(demands, dtype=float)
+    n = len(costs)
+    coverage = np.asarray(coverage, dtype=float).reshape(len(demands), n)
+    # 要求量が0以下の制約は常に満たされるため除く
+    rows = demands > EPS
+    coverage = coverage[rows]
+    demands = demands[rows]
+    m = len(demands)
+    if m == 0:
+        return np.zeros(n)
+    if np.any(coverage.sum(axis=1) < demands - EPS):
+        return None
+
+    # 列: x（n）・被覆の余剰変数（m）・上限のスラック変数（n）・人為変数（m）・右辺
+    surplus, slack, artificial = n, n + m, 2 * n + m
+    width = 2 * n + 2 * m
+    tableau = np.zeros((m + n + 1, width + 1))
+    tableau[:m, :n] = coverage
+    tableau[:m, surplus:slack] = -np.eye(m)
+    tableau[:m, artificial:width] = np.eye(m)
+    tableau[:m, -1] = demands
+    tableau[m:m + n, :n] = np.eye(n)
+    tableau[m:m + n, slack:artificial] = np.eye(n)
+    tableau[m:m + n, -1] = 1
+    basis = list(range(artificial, width)) + list(range(slack, artificial))
+
+    # 第1段階: 人為変数の合計を最小化して実行可能な基底を求める
+    tableau[-1, artificial:width] = 1
+    tableau[-1] -= tableau[:m].sum(axis=0)
+    _run_simplex(tableau, basis, width)
+    if tableau[-1, -1] < -EPS * max(1, demands.sum()):
+        return None
+    # 値が0で基底に残った人為変数は、人為変数以外の列と入れ替える
+    for row, column in enumerate(basis):
+        if column < artificial:
+            continue
+        candidates = np.nonzero(np.abs(tableau[row, :artificial]) > EPS)[0]
+        if len(candidates):
+            _pivot(tableau, basis, row, candidates[0])
+
+    # 第2段階: 人為変数を除いてcostsを最小化する
+    tableau[-1] = 0
+    tableau[-1, :n] = costs
+    for row, column in enumerate(basis):
+        if column < n and tableau[-1, column] != 0:
+            tableau[-1] -= tableau[-1, column] * tableau[row]
+    _run_simplex(tableau, basis, artificial)
+    x = np.zeros(n)
+    for row, column in enumerate(basis):
+        if column < n:
+            x[column] = tableau[row, -1]
+    return np.clip(x, 0, 1)
+
+
+def solve_integer(costs, coverage, demands, deadline=None, clock=None, on_node=None):
+    '''
+    被覆問題の0-1整数計画を、LP緩和の下界による分枝限定法で解く
+    各ノードではLP緩和の解の正の変数を全て1に切り上げ、不要な変数を外した解を暫定解の候補とする
+    deadline: clock()の値がこれを超えた場合はTimeoutErrorを送出する
+    on_node: ノードを1つ処理するごとに呼び出す関数
+    戻り値: 1とする変数のindexのリスト（コストの昇順）。実行可能解がない場合はNone
+    '''
+    costs = np.asarray(costs, dtype=float)
+    demands = np.asarray(demands, dtype=float)
+    n = len(costs)
+    coverage = np.asarray(coverage, dtype=float).reshape(len(demands), n)
+    best = [None, float("inf")]
+
+    def covers(selected):
+        return np.all(coverage[:, selected].sum(axis=1) >= demands - EPS)
+
+    def branch(fixed_one, free):
+        if deadline is not None and clock() > deadline:
+            raise TimeoutError
+        if on_node is not None:
+            on_node()
+        fixed_cost = costs[fixed_one].sum()
+        residual = demands - coverage[:, fixed_one].sum(axis=1)
+        x = solve_relaxation(costs[free], coverage[:, free], residual)
+        if x is None:
+            return
+        if fixed_cost + costs[free] @ x >= best[1] - EPS:
+            return
+        # LP緩和の解の切り上げ（不要な変数はコストの大きい順に外す）
+        rounded = list(fixed_one) + [free[i] for i in np.nonzero(x > EPS)[0]]
+        for i in sorted(rounded, key=lambda i: costs[i], reverse=True):
+            rest = [j for j in rounded if j != i]
+            if covers(rest):
+                rounded = rest
+        cost = costs[rounded].sum()
+        if cost < best[1] - EPS:
+            best[0], best[1] = rounded, cost
+        fractional = np.abs(x - np.round(x)) > EPS
+        if not np.any(fractional):
+            return
+        # 最も0.5に近い変数で分枝し、1とする側から探索する
+        i = int(np.argmin(np.where(fractional, np.abs(x - 0.5), np.inf)))
+        rest = free[:i] + free[i + 1:]
+        branch(fixed_one + [free[i]], rest)
+        branch(fixed_one, rest)
+
+    branch([], list(range(n)))
+    if best[0] is None:
+        return None
+    return sorted(best[0], key=lambda i: costs[i])
+
+
+def _run_simplex(tableau, basis, width):
+    '''
+    目的関数の行の被約費用が負の列（index < width）がなくなるまでピボットする
+    '''
+    while True:
+        columns = np.nonzero(tableau[-1, :width] < -EPS)[0]
+        if not len(columns):
+            return
+        column = columns[0]
+        rows = np.nonzero(tableau[:-1, column] > EPS)[0]
+        if not len(rows):
+            # 被覆問題は0 <= x <= 1で有界のため発生しない
+            raise ValueError("unbounded")
+        ratios = tableau[rows, -1] / tableau[rows, column]
+        minimum = ratios.min()
+        ties = rows[ratios <= minimum + EPS]
+        row = min(ties, key=lambda r: basis[r])
+        _pivot(tableau, basis, row, column)
+
+
+def _pivot(tableau, basis, row, column):
+    tableau[row] /= tableau[row, column]
+    for r in range(len(tableau)):
+        if r != row and tableau[r, column] != 0:
+            tableau[r] -= tableau[r, column] * tableau[row]
+    basis[row] = column
@@ -0,0 +1,69 @@
+class FlowCookie:
+    '''
+    フローのcookieの割り当て
+    上位8bitにフローの種別、48bit目に方向（送信元→宛先が0）、下位48bitに送信元・宛先hostの番号（各24bit）を格納する
+    フロー統計情報のリクエストをcookie・maskで絞り込み、応答のcookieから直接トラフィックを特定するために使用する
+    '''
+    DEFAULT = 1
+    VIDEO = 2
+    OTHER = 3
+
+    CLASS_SHIFT = 56
+    CLASS_MASK = 0xff << CLASS_SHIFT
+    REVERSE_BIT = 1 << 48
+    HOST_BITS = 24
+    HOST_MASK = (1 << HOST_BITS) - 1
+    # 種別・方向・送信元・宛先の全てでマッチするmask
+    FULL_MASK = (1 << 64) - 1
+
+    def __init__(self, hosts):
+        '''
+        初期化
+        hosts: definitions.hostのHOST_LISTと同じ形式のhost情報
+        hostの番号は0を未指定とするため1から割り当てる
+        '''
+        self.host_ids = {host["name"]: i + 1 for i, host in enumerate(hosts)}
+        self.host_names = {i: name for name, i in self.host_ids.items()}
+
+    def create(self, traffic_class, src_host=None, dst_host=None, reverse=False):
+        '''
+        cookieを生成する
+        reverse: 宛先→送信元方向のフローかどうか
+        '''
+        cookie = traffic_class << self.CLASS_SHIFT
+        if src_host is not None:
+            cookie |= self.host_ids[src_host] << self.HOST_BITS
+        if dst_host is not None:
+            cookie |= self.host_ids[dst_host]
+        if reverse:
+            cookie |= self.REVERSE_BIT
+        return cookie
+
+    def get_class(self, cookie):
+        '''
+        cookieからフローの種別を取得する
+        '''
+        return cookie >> self.CLASS_SHIFT
+
+    def get_key(self, cookie):
+        '''
+        cookieから他トラフィック情報のキー（送信元と宛先のhost名をつなげた文字列）を取得する
+        '''
+        src_host = self.host_names.get((cookie >> self.HOST_BITS) & self.HOST_MASK)
+        dst_host = self.host_names.get(cookie & self.HOST_MASK)
+        if src_host is None or dst_host is None:
+            return None
+        return f"{src_host}{dst_host}"
+
+    @classmethod
+    def get_class_filter(cls, traffic_class):
+        '''
+        種別の全てのフローにマッチする(cookie, cookie_mask)
+        '''
+        return traffic_class << cls.CLASS_SHIFT, cls.CLASS_MASK
+
+    def get_stats_filter(self, traffic_class):
+        '''
+        種別のフローのうち送信元→宛先方向のみを取得するフロー統計情報のリクエストの(cookie, cookie_mask)
+        '''
+        return traffic_class << self.CLASS_SHIFT, self.CLASS_MASK | self.REVERSE_BIT
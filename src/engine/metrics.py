@@ -0,0 +1,216 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# Prometheusのテキスト形式のContent-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# ヒストグラムの既定のバケット（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    '''
+    ラベルの値の組ごとに値を保持するメトリクスの基底クラス
+    '''
+    type_name = None
+
+    def __init__(self, name, help_text, label_names=()):
+        '''
+        初期化
+        label_names: ラベル名のタプル。値はobserve / incのキーワード引数で指定する
+        '''
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        # ラベルの値のタプル → 値
+        self.values = {}
+
+    def render(self):
+        '''
+        Prometheusのテキスト形式の行のリストを取得する
+        '''
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def reset(self):
+        '''
+        記録した値を全て削除する
+        '''
+        with self.lock:
+            self.values = {}
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{self._format_labels(labels)} {_format_number(value)}"]
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _format_labels(self, values, extra=()):
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter(Metric):
+    '''
+    増加のみするカウンタ
+    '''
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    '''
+    取得時に関数を呼び出して値を求めるゲージ
+    '''
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, callback=None):
+        super().__init__(name, help_text)
+        self.callback = callback
+
+    def render(self):
+        if self.callback is not None:
+            self.values = {(): self.callback()}
+        return super().render()
+
+
+class Histogram(Metric):
+    '''
+    観測値の分布をバケットごとの累積数で保持するヒストグラム
+    '''
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        '''
+        値を1つ記録する
+        '''
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [バケットごとの数（最後は+Inf）, 合計, 件数]
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        '''
+        withブロックの実行時間（秒）を記録するコンテキストマネージャ
+        '''
+        return _Timer(self, labels)
+
+    def _render_value(self, labels, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else _format_number(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(labels)} {_format_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    '''
+    メトリクスを名前で登録し、まとめてPrometheusのテキスト形式で出力する
+    同じ名前で再度登録した場合は登録済みのメトリクスを返す
+    '''
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, label_names=()):
+        return self.__register(name, lambda: Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.__register(name, lambda: Histogram(name, help_text, label_names, buckets))
+
+    def gauge(self, name, help_text, callback=None):
+        gauge = self.__register(name, lambda: Gauge(name, help_text))
+        gauge.callback = callback
+        return gauge
+
+    def reset(self):
+        '''
+        登録済みの全メトリクスの値を削除する（登録は残す）
+        '''
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self):
+        '''
+        登録済みの全メトリクスをPrometheusのテキスト形式で取得する
+        '''
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def __register(self, name, factory):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = factory()
+            return self.metrics[name]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def timed(histogram, **labels):
+    '''
+    関数の実行時間をhistogramに記録するデコレータ
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# コントローラー全体で共有するレジストリ
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,21 @@
+class PathInfo:
+    '''
+    経路選択に使用するパスの集計情報
+    nodes: パスに含まれるnodeのリスト。srcからdstの順で含まれる
+    hop_count: ホップ数
+    min_bandwidth: 利用できる帯域
+    exceeded_video_limitation_relations: ビデオの最低保証帯域を下回るホップのindex
+    '''
+    __slots__ = ("nodes", "hop_count", "min_bandwidth", "exceeded_video_limitation_relations")
+
+    def __init__(self, nodes, min_bandwidth, exceeded_video_limitation_relations):
+        '''
+        初期化
+        '''
+        self.nodes = nodes
+        self.hop_count = len(nodes) - 1
+        self.min_bandwidth = min_bandwidth
+        self.exceeded_video_limitation_relations = exceeded_video_limitation_relations
+
+    def __repr__(self):
+        return f"PathInfo(nodes={self.nodes}, hop_count={self.hop_count}, min_bandwidth={self.min_bandwidth})"
@@ -0,0 +1,119 @@
+import time
+
+from ryu.lib import hub
+
+
+class BarrierTimeoutError(Exception):
+    '''
+    timeout以内にbarrierの応答がないSwitchがある場合に送出する
+    '''
+    pass
+
+
+class PathInstaller:
+    '''
+    パス上の複数Switchへのフロー登録をまとめて送信し、barrierの応答で完了を確認する
+    Switchごとの接続は独立しているため、同じphase内の送信順は適用順を保証しない
+    適用順はphaseの間のbarrierの応答（strict_orderの場合はSwitchごと）でのみ保証する
+    '''
+
+    def __init__(self, timeout=5, use_bundle=False, strict_order=False):
+        '''
+        初期化
+        timeout: barrierの応答を待つ時間（秒）
+        use_bundle: Switchごとのフロー登録をOpenFlow 1.3のbundle（ONF拡張）でまとめて適用するか
+        strict_order: Switchごとにbarrierの応答を待ってから次のSwitchに送信するか
+        '''
+        self.timeout = timeout
+        self.use_bundle = use_bundle
+        self.strict_order = strict_order
+        # (dpid, xid) → barrierの応答を待つEvent
+        self.waiters = {}
+        self.bundle_id = 0
+
+    def install(self, phases, merge_by_switch=False):
+        '''
+        phaseの順にフロー登録を送信し、phaseごとに全Switchのbarrierの応答を待ってから次のphaseを送信する
+        phases: stepsのリスト。steps: (datapath, [flow_modのリスト])のリスト
+        パスのフロー登録は出口側・経由するSwitchを前のphase、入口のSwitchを後のphaseとすることで、
+        入口のフローが切り替わる時点でそれ以降のSwitchのフローが適用済みであることを保証する
+        strict_orderの場合はphase内でもstepsの順にSwitchごとにbarrierの応答を待つ
+        merge_by_switch: phase内の同じSwitchへのフロー登録を1つにまとめるか（phaseをまたいではまとめない）
+        timeout以内に応答がないSwitchがあればBarrierTimeoutErrorを送出する
+        '''
+        deadline = time.monotonic() + self.timeout
+        for steps in phases:
+            waiting = []
+            for datapath, mods in self.__merge_steps(steps, merge_by_switch):
+                self.__send_mods(datapath, mods)
+                waiting.append(self.__send_barrier(datapath))
+                if self.strict_order:
+                    self.__wait(waiting, deadline)
+                    waiting = []
+            self.__wait(waiting, deadline)
+
+    def barrier_reply(self, datapath, xid):
+        '''
+        barrierの応答を受信した時に呼び出す
+        '''
+        event = self.waiters.pop((datapath.id, xid), None)
+        if event:
+            event.set()
+
+    def __send_mods(self, datapath, mods):
+        '''
+        Switchにフロー登録を送信する
+        '''
+        if not self.use_bundle:
+            for mod in mods:
+                datapath.send_msg(mod)
+            return
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        self.bundle_id += 1
+        flags = ofproto.ONF_BF_ATOMIC | ofproto.ONF_BF_ORDERED
+        datapath.send_msg(parser.ONFBundleCtrlMsg(datapath, self.bundle_id, ofproto.ONF_BCT_OPEN_REQUEST, flags, []))
+        for mod in mods:
+            datapath.send_msg(parser.ONFBundleAddMsg(datapath, self.bundle_id, flags, mod, []))
+        datapath.send_msg(parser.ONFBundleCtrlMsg(datapath, self.bundle_id, ofproto.ONF_BCT_COMMIT_REQUEST, flags, []))
+
+    def __send_barrier(self, datapath):
+        '''
+        barrierを送信し、応答を待つ(dpid, xid, Event)を返す
+        '''
+        req = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+        datapath.set_xid(req)
+        event = hub.Event()
+        self.waiters[(datapath.id, req.xid)] = event
+        datapath.send_msg(req)
+        return datapath.id, req.xid, event
+
+    def __wait(self, waiting, deadline):
+        '''
+        送信したbarrierの応答をdeadlineまで待つ
+        '''
+        failed = []
+        for dpid, xid, event in waiting:
+            if not event.wait(max(deadline - time.monotonic(), 0)):
+                self.waiters.pop((dpid, xid), None)
+                failed.append(dpid)
+        if failed:
+            raise BarrierTimeoutError(f"barrier reply timeout. dpid: {failed}")
+
+    @staticmethod
+    def __merge_steps(steps, merge_by_switch):
+        '''
+        連続する同じSwitchへのフロー登録を1つにまとめる
+        merge_by_switchの場合は同じSwitchへのフロー登録を全て1つにまとめる
+        '''
+        merged = []
+        positions = {}
+        for datapath, mods in steps:
+            if merge_by_switch and datapath.id in positions:
+                merged[positions[datapath.id]][1].extend(mods)
+            elif merged and merged[-1][0].id == datapath.id:
+                merged[-1][1].extend(mods)
+            else:
+                positions[datapath.id] = len(merged)
+                merged.append((datapath, list(mods)))
+        return merged
@@ -0,0 +1,159 @@
+from array import array
+
+# 推定方法（EWMA: 指数加重移動平均、WINDOW: 直近window個の区間の時間加重平均）
+EWMA = "ewma"
+WINDOW = "window"
+
+
+class RateEstimator:
+    '''
+    統計情報の累積カウンタ（バイト数）のサンプルから、キー（ポート・フロー）ごとに使用帯域（bps）を推定する
+    キーごとに直近window個の区間の使用帯域を固定長のリングバッファ（array）に保持し、
+    1回の区間の値ではなくEWMAまたは区間の平均で推定することで、1回のノイズで経路選択が変わらないようにする
+    '''
+
+    def __init__(self, channels=1, window=8, mode=EWMA, alpha=0.5):
+        '''
+        初期化
+        channels: キーごとのカウンタの数（ポートの場合は受信・送信の2）
+        window: 保持する区間の数
+        mode: get_rateで返す推定値（EWMAまたはWINDOW）
+        alpha: EWMAの新しい区間の重み
+        '''
+        if mode not in (EWMA, WINDOW):
+            raise ValueError(f"unknown mode: {mode}")
+        self.channels = channels
+        self.window = window
+        self.mode = mode
+        self.alpha = alpha
+        # キー → _RateSeries
+        self.series = {}
+        # カウンタ・時刻が戻ったため基準を取り直した回数
+        self.resets = 0
+
+    def add(self, key, timestamp, counters):
+        '''
+        サンプルを追加し、推定した使用帯域（channelsの数のタプル）を返す
+        timestamp: サンプルの時刻（秒）。統計情報のduration
+        counters: channelsの数の累積カウンタ（バイト数）
+        最初のサンプルは基準とするのみで、区間の使用帯域がない場合はNoneを返す
+        '''
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _RateSeries(self.channels, self.window)
+        if series.add(timestamp, counters, self.alpha):
+            self.resets += 1
+        return self.get_rate(key)
+
+    def get_rate(self, key):
+        '''
+        modeで指定した推定方法の使用帯域を取得する。区間がない場合はNone
+        '''
+        if self.mode == EWMA:
+            return self.get_ewma(key)
+        return self.get_mean(key)
+
+    def get_ewma(self, key):
+        '''
+        使用帯域のEWMAを取得する
+        '''
+        series = self.series.get(key)
+        if series is None or series.count == 0:
+            return None
+        return tuple(series.ewma)
+
+    def get_mean(self, key):
+        '''
+        直近window個の区間の使用帯域の時間加重平均を取得する
+        '''
+        series = self.series.get(key)
+        if series is None or series.count == 0:
+            return None
+        return series.mean()
+
+    def get_peak(self, key):
+        '''
+        直近window個の区間の使用帯域の最大値を取得する
+        '''
+        series = self.series.get(key)
+        if series is None or series.count == 0:
+            return None
+        return series.peak()
+
+    def remove(self, key):
+        '''
+        キーのサンプルを削除する
+        '''
+        self.series.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.series
+
+    def __len__(self):
+        return len(self.series)
+
+
+class _RateSeries:
+    '''
+    1つのキーのサンプルのリングバッファ
+    rates[i * channels + c]がi番目の区間のchannel cの使用帯域、durations[i]がその区間の長さ
+    '''
+    __slots__ = ("channels", "window", "durations", "rates", "index", "count", "ewma",
+                 "last_time", "last_counters")
+
+    def __init__(self, channels, window):
+        self.channels = channels
+        self.window = window
+        self.durations = array("d", bytes(8 * window))
+        self.rates = array("d", bytes(8 * window * channels))
+        self.index = 0
+        self.count = 0
+        self.ewma = [0.0] * channels
+        self.last_time = None
+        self.last_counters = None
+
+    def add(self, timestamp, counters, alpha):
+        '''
+        サンプルを追加する
+        戻り値: カウンタのリセットで基準を取り直した場合はTrue
+        '''
+        if self.last_time is None:
+            self.__rebase(timestamp, counters)
+            return False
+        duration = timestamp - self.last_time
+        deltas = [counter - last for counter, last in zip(counters, self.last_counters)]
+        # 時刻またはカウンタが戻った場合（フローの再登録・Switchの再起動）は区間を作らずに基準を取り直す
+        if duration < 0 or any(delta < 0 for delta in deltas):
+            self.__rebase(timestamp, counters)
+            return True
+        # 同じ時刻のサンプルは区間の長さが0のため、次のサンプルとの区間に含める
+        if duration == 0:
+            return False
+        offset = self.index * self.channels
+        self.durations[self.index] = duration
+        for c, delta in enumerate(deltas):
+            rate = delta * 8 / duration
+            self.rates[offset + c] = rate
+            self.ewma[c] = rate if self.count == 0 else alpha * rate + (1 - alpha) * self.ewma[c]
+        self.index = (self.index + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        self.__rebase(timestamp, counters)
+        return False
+
+    def mean(self):
+        total = sum(self.durations[i] for i in self.__indexes())
+        return tuple(
+            sum(self.rates[i * self.channels + c] * self.durations[i] for i in self.__indexes()) / total
+            for c in range(self.channels)
+        )
+
+    def peak(self):
+        return tuple(max(self.rates[i * self.channels + c] for i in self.__indexes()) for c in range(self.channels))
+
+    def __indexes(self):
+        # 書き込み済みの区間のindex（リングバッファが一巡するまでは先頭からcount個）
+        return range(self.count)
+
+    def __rebase(self, timestamp, counters):
+        self.last_time = timestamp
+        self.last_counters = tuple(counters)
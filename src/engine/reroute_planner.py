@@ -0,0 +1,172 @@
+import time
+from enum import Enum
+
+from engine.covering_lp import solve_integer
+
+
+class PathSelectAlgorithm(Enum):
+    '''
+    切り替えアルゴリズム用Enumクラス
+    '''
+    NO_CHANGE: int = 0
+    SHORTEST_PATH: int = 1
+    LONGEST_PATH: int = 2
+    BANDWIDTH: int = 3
+    OPTIMIZATION: int = 4
+
+
+class ReroutePlanner:
+    '''
+    ビデオトラフィックのパスの帯域が不足している場合に、切り替える他トラフィックとその切り替え先のパスを決定する
+    '''
+
+    def __init__(self, topology, limit_video_bandwidth, limit_other_bandwidth,
+                 k=None, max_hop_count=None, timeout=0.5, fallback=PathSelectAlgorithm.BANDWIDTH,
+                 max_candidates=32, cooperative_yield=None):
+        '''
+        初期化
+        topology: 使用帯域情報を保持するTopologyGraph
+        limit_video_bandwidth / limit_other_bandwidth: ビデオストリームと他トラフィックの最低保障帯域
+        k / max_hop_count: 切り替え先の候補パス数とホップ数の上限
+        timeout: OPTIMIZATIONの計算時間の上限（秒）。超えた場合はfallbackのアルゴリズムで決定する
+        max_candidates: OPTIMIZATIONで切り替えの候補とする他トラフィックの数の上限（使用帯域の大きい順）
+        cooperative_yield: OPTIMIZATIONの分枝限定法のノードごとに呼び出す関数（コントローラーではhub.sleep(0)で他の処理に譲る）
+        '''
+        self.topology = topology
+        self.limit_video_bandwidth = limit_video_bandwidth
+        self.limit_other_bandwidth = limit_other_bandwidth
+        self.k = k
+        self.max_hop_count = max_hop_count
+        self.timeout = timeout
+        self.fallback = fallback
+        self.max_candidates = max_candidates
+        self.cooperative_yield = cooperative_yield
+
+    def plan(self, algorithm, info, other_traffic, other_traffic_rate):
+        '''
+        切り替える他トラフィックのkeyと切り替え先のパスのリストを取得する
+        info: ビデオトラフィックのパスのPathInfo
+        other_traffic: 他トラフィックのkey → 現在のパス
+        other_traffic_rate: 他トラフィックのkey → {"tx_rate": 使用帯域（bps）}（コントローラーではRateEstimatorの推定値）
+        切り替え先のパスがNoneの場合は、呼び出し側で条件を満たす最短のパスを選択する
+        '''
+        if algorithm == PathSelectAlgorithm.OPTIMIZATION:
+            try:
+                plan = self.__select_optimal(info, other_traffic, other_traffic_rate)
+                if plan is not None:
+                    return plan
+                algorithm = self.fallback
+            except TimeoutError:
+                algorithm = self.fallback
+        return [(key, None) for key in self.__select_greedy(algorithm, info, other_traffic, other_traffic_rate)]
+
+    def __select_greedy(self, algorithm, info, other_traffic, other_traffic_rate):
+        '''
+        ビデオ最低保証帯域を満たさないリンクごとに、提案方式の順で最初に見つかった他トラフィックを選択する
+        '''
+        # 実行ごとに同じ順で切り替えるため、挿入順を保持するdictを集合として使用する
+        change_traffic_keys = {}
+        for i in info.exceeded_video_limitation_relations:
+            # ビデオ最低保証帯域を満たさないパスを含む他トラフィック情報を取得
+            flg_find = 0
+            node1 = info.nodes[i]
+            node2 = info.nodes[i + 1]
+            other_traffic_list = [{"key": k,  "nodes": v, "num_nodes": len(v)} for k, v in  other_traffic.items()]
+            # 提案方式にしたがって、対象他トラフィックをソート
+            if algorithm == PathSelectAlgorithm.SHORTEST_PATH:
+                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['num_nodes'])
+            elif algorithm == PathSelectAlgorithm.LONGEST_PATH:
+                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['num_nodes'], reverse=True)
+            elif algorithm == PathSelectAlgorithm.BANDWIDTH:
+                for traffic in other_traffic_list:
+                    traffic["tx_rate"] = other_traffic_rate.get(traffic["key"], {}).get("tx_rate", 0)
+                sorted_other_traffic_list = sorted(other_traffic_list, key=lambda x: x['tx_rate'], reverse=True)
+            else:
+                raise Exception("not enough bandwidth")
+            # 切り替える他トラフィックを決定
+            for traffic in sorted_other_traffic_list:
+                key = traffic["key"]
+                other_traffic_nodes = traffic["nodes"]
+                for j in range(len(other_traffic_nodes) - 1):
+                    # 他トラフィックのパスにビデオ最低保証帯域を満たさないパスが含まれていれば、切り替える他トラフィックとする
+                    if other_traffic_nodes[j] == node1 and other_traffic_nodes[j + 1] == node2:
+                        change_traffic_keys[key] = None
+                        flg_find = 1
+                        break
+                if flg_find == 1:
+                    break
+        return list(change_traffic_keys)
+
+    def __select_optimal(self, info, other_traffic, other_traffic_rate):
+        '''
+        ビデオ最低保証帯域を満たすために切り替える他トラフィックを0-1整数計画で選択する
+        変数は候補の他トラフィックを切り替えるか、制約は帯域が不足している各リンクで解放する使用帯域が要求量以上であること
+        コストは1 + 使用帯域 / (2 × 候補の使用帯域の合計)とし、切り替える数が最小の中で切り替える使用帯域の合計が最小のものを選ぶ
+        LP緩和（単体法）の下界による分枝限定法で解き、各ノードではLP緩和の解を切り上げた解を暫定解とする
+        切り替え先のパスを割り当てられない他トラフィックがあれば、候補から外して解き直す
+        条件を満たす選択がない場合はNone、timeoutを超えた場合はTimeoutErrorを送出する
+        '''
+        deadline = time.monotonic() + self.timeout
+        bandwidth = self.topology.bandwidth
+        # ビデオ最低保証帯域を満たすために各リンクで減らす必要がある使用帯域
+        demands = {}
+        for i in info.exceeded_video_limitation_relations:
+            hop = (info.nodes[i], info.nodes[i + 1])
+            demands[hop] = self.limit_video_bandwidth - (bandwidth - self.topology.get_utilization(*hop))
+
+        # 帯域が不足しているリンクを通る他トラフィックを、使用帯域の大きい順にmax_candidates個まで候補とする
+        candidates = []
+        for key, nodes in other_traffic.items():
+            if not nodes:
+                continue
+            hops = {(nodes[j], nodes[j + 1]) for j in range(len(nodes) - 1)}
+            covered = [hop for hop in demands if hop in hops]
+            if covered:
+                rate = other_traffic_rate.get(key, {}).get("tx_rate", 0) / 1024 / 1024
+                candidates.append((key, nodes, rate, covered))
+        candidates.sort(key=lambda x: x[2], reverse=True)
+        candidates = candidates[:self.max_candidates]
+
+        hops = list(demands)
+        while candidates:
+            total_rate = sum(c[2] for c in candidates) or 1
+            costs = [1 + c[2] / (2 * total_rate) for c in candidates]
+            coverage = [[c[2] if hop in c[3] else 0 for c in candidates] for hop in hops]
+            selected = solve_integer(costs, coverage, [demands[hop] for hop in hops],
+                                     deadline, time.monotonic, self.cooperative_yield)
+            if selected is None:
+                return None
+            combo = [candidates[i] for i in selected]
+            assignment, failed = self.__assign_paths(combo, info.nodes)
+            if failed is None:
+                return assignment
+            candidates.remove(failed)
+        return None
+
+    def __assign_paths(self, combo, video_nodes):
+        '''
+        組み合わせの他トラフィックに順に切り替え先のパスを割り当てる
+        ビデオトラフィックのパスのリンクは通らない
+        戻り値: (割り当てのリスト, None)。割り当てられない他トラフィックがあれば(None, その他トラフィック)
+        '''
+        bandwidth = self.topology.bandwidth
+        delta = {}
+        # 切り替える他トラフィックの使用帯域を現在のパスから除く
+        for _, nodes, rate, _ in combo:
+            for j in range(len(nodes) - 1):
+                hop = (nodes[j], nodes[j + 1])
+                delta[hop] = delta.get(hop, 0) - rate
+        assignment = []
+        for candidate in combo:
+            key, nodes, rate, _ = candidate
+            for path in self.topology.iter_shortest_paths(nodes[0], nodes[-1], self.k, self.max_hop_count, video_nodes):
+                hops = [(path[j], path[j + 1]) for j in range(len(path) - 1)]
+                min_bandwidth = min(bandwidth - self.topology.get_utilization(*hop) - delta.get(hop, 0) for hop in hops)
+                if min_bandwidth >= self.limit_other_bandwidth:
+                    for hop in hops:
+                        delta[hop] = delta.get(hop, 0) + rate
+                    assignment.append((key, path))
+                    break
+            else:
+                return None, candidate
+        return assignment, None
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+
+from engine.path_info import PathInfo
+
+
+class RouteCache:
+    '''
+    src・dst・filter_pathごとの候補パスをLRUで保持するキャッシュ
+    候補パスはTopologyGraph.iter_shortest_pathsのgeneratorから必要になった分だけ取り出して保持し、
+    以降の検索では保持済みの先頭部分を使い回して、足りない場合のみgeneratorから追加する
+    候補パスはトポロジのみで決まるため、トポロジが変わらない限り有効
+    使用帯域に依存するパスの評価は使用帯域のepochごとに計算し直す
+    '''
+
+    def __init__(self, topology, k=None, max_hop_count=None, max_size=1024):
+        '''
+        初期化
+        topology: 候補パスの検索と使用帯域の参照に使用するTopologyGraph
+        k / max_hop_count: 候補パス数とホップ数の上限（Noneの場合は制限なし）
+        max_size: キャッシュする候補パスの組の最大数
+        '''
+        self.topology = topology
+        self.k = k
+        self.max_hop_count = max_hop_count
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        # 使用帯域が更新されるたびに進めるカウンタ
+        self.epoch = 0
+        self.path_hits = 0
+        self.path_misses = 0
+        self.score_hits = 0
+        self.score_misses = 0
+
+    def bump_epoch(self):
+        '''
+        使用帯域が更新されたことを通知し、パスの評価を無効にする
+        '''
+        self.epoch += 1
+
+    def get_path_info_list(self, src_node_name, dst_node_name, limit_bandwidth, filter_path=None, shortest_only=False):
+        '''
+        srcからdstへの候補パスのPathInfo（ホップ数の小さい順）を全て取得する
+        最短パスのみ（shortest_only）または全候補を評価する場合に使用し、条件を満たすパスを探す場合はiter_path_infoを使用する
+        '''
+        return list(self.iter_path_info(src_node_name, dst_node_name, limit_bandwidth, filter_path, shortest_only))
+
+    def iter_path_info(self, src_node_name, dst_node_name, limit_bandwidth, filter_path=None, shortest_only=False):
+        '''
+        srcからdstへの候補パスのPathInfoをホップ数の小さい順に生成する
+        呼び出し側が条件を満たすパスを見つけて打ち切った場合、それ以降の候補パスは検索も評価もしない
+        評価は現在のepochで計算済みであればそれを返す
+        '''
+        entry = self.__get_entry(src_node_name, dst_node_name, filter_path, shortest_only)
+        if entry["epoch"] != self.epoch or entry["limit_bandwidth"] != limit_bandwidth:
+            entry["epoch"] = self.epoch
+            entry["limit_bandwidth"] = limit_bandwidth
+            entry["path_info_list"] = []
+        if entry["path_info_list"]:
+            self.score_hits += 1
+        else:
+            self.score_misses += 1
+        i = 0
+        while True:
+            path_info_list = entry["path_info_list"]
+            if i >= len(path_info_list):
+                if i >= len(entry["paths"]) and not self.__extend(entry):
+                    return
+                self.__score(entry, limit_bandwidth)
+                continue
+            yield path_info_list[i]
+            i += 1
+
+    def get_stats(self):
+        '''
+        キャッシュのヒット・ミスの回数を取得する
+        '''
+        return {
+            "size": len(self.entries),
+            "epoch": self.epoch,
+            "path_hits": self.path_hits,
+            "path_misses": self.path_misses,
+            "score_hits": self.score_hits,
+            "score_misses": self.score_misses
+        }
+
+    def __get_entry(self, src_node_name, dst_node_name, filter_path, shortest_only):
+        '''
+        候補パスのキャッシュを取得する。ない場合は候補パスのgeneratorを登録する（パスの検索は必要になった時に行う）
+        '''
+        key = (src_node_name, dst_node_name, tuple(filter_path) if filter_path else None, shortest_only)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.path_hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.path_misses += 1
+        k = 1 if shortest_only else self.k
+        entry = {
+            "generator": self.topology.iter_shortest_paths(src_node_name, dst_node_name, k, self.max_hop_count, filter_path),
+            # 取り出し済みの候補パスとそのリンクidの配列
+            "paths": [],
+            "indexes": [],
+            "epoch": None,
+            "limit_bandwidth": None,
+            # 現在のepochで評価済みの先頭部分のPathInfo
+            "path_info_list": []
+        }
+        self.entries[key] = entry
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def __extend(self, entry):
+        '''
+        generatorから候補パスを追加する。取り出し済みのパス数と同じ数（最初は1本）ずつ追加し、
+        続けて必要になった場合の評価をまとめて行えるようにする
+        戻り値: 1本以上追加した場合はTrue
+        '''
+        generator = entry["generator"]
+        if generator is None:
+            return False
+        utilization = self.topology.utilization
+        count = max(1, len(entry["paths"]))
+        added = 0
+        for nodes in generator:
+            if len(nodes) != len(set(nodes)):
+                continue
+            entry["paths"].append(nodes)
+            entry["indexes"].append(utilization.path_to_index(nodes))
+            added += 1
+            if added >= count:
+                break
+        else:
+            # 全ての候補パスを取り出した
+            entry["generator"] = None
+        return added > 0
+
+    def __score(self, entry, limit_bandwidth):
+        '''
+        取り出し済みで未評価の候補パスをまとめて評価する
+        '''
+        path_info_list = entry["path_info_list"]
+        start = len(path_info_list)
+        paths = entry["paths"][start:]
+        utilization = self.topology.utilization
+        matrix = utilization.to_matrix(entry["indexes"][start:])
+        min_bandwidth, exceeded = utilization.score_paths(matrix, limit_bandwidth)
+        for i, nodes in enumerate(paths):
+            path_info_list.append(PathInfo(nodes, float(min_bandwidth[i]), exceeded[i].nonzero()[0].tolist()))
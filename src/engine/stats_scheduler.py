@@ -0,0 +1,113 @@
+class StatsScheduler:
+    '''
+    Switchごとの統計情報リクエストの送信タイミングを管理する
+    リクエストは間隔内で均等にずらして送信し、間隔はリンクの空き帯域に応じて調整する
+    '''
+
+    def __init__(self, interval=10, min_interval=2, max_interval=30, max_sleep=1):
+        '''
+        初期化
+        interval: 登録直後の統計情報リクエストの間隔（秒）
+        min_interval: 空き帯域が少ないSwitchの間隔（秒）
+        max_interval: アイドル状態のSwitchの間隔（秒）
+        max_sleep: モニターの最大待ち時間（秒）
+        '''
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_sleep = max_sleep
+        # dpid → スケジュール情報
+        self.schedule = {}
+
+    def add(self, dpid, now):
+        '''
+        Switchを登録し、全Switchのリクエストタイミングを間隔内で均等にずらす
+        '''
+        self.schedule[dpid] = {
+            "interval": self.interval,
+            "next_poll": now,
+            "last_request": None,
+            "poll_lag": 0,
+            "reply_latency": None
+        }
+        self.__stagger(now)
+
+    def remove(self, dpid):
+        '''
+        Switchの登録を削除する
+        '''
+        self.schedule.pop(dpid, None)
+
+    def get_due(self, now):
+        '''
+        リクエストを送信する時刻になったSwitchのdpidのリストを取得し、次回の送信時刻を設定する
+        '''
+        due = []
+        for dpid, info in self.schedule.items():
+            if info["next_poll"] > now:
+                continue
+            # 予定時刻からの遅れ
+            info["poll_lag"] = now - info["next_poll"]
+            info["last_request"] = now
+            info["next_poll"] = now + info["interval"]
+            due.append(dpid)
+        return due
+
+    def get_sleep_time(self, now):
+        '''
+        次にリクエストを送信するSwitchの予定時刻までの待ち時間を取得する
+        '''
+        if not self.schedule:
+            return self.max_sleep
+        next_poll = min(info["next_poll"] for info in self.schedule.values())
+        return min(max(next_poll - now, 0), self.max_sleep)
+
+    def reply_received(self, dpid, now):
+        '''
+        統計情報の応答を受信した時に応答までの時間を記録する
+        '''
+        info = self.schedule.get(dpid)
+        if info is None or info["last_request"] is None:
+            return
+        info["reply_latency"] = now - info["last_request"]
+
+    def update_interval(self, dpid, headroom, limit_bandwidth, bandwidth):
+        '''
+        Switchのリンクの空き帯域に応じてリクエスト間隔を調整する
+        空き帯域がlimit_bandwidthの2倍以下ならmin_interval、リンクが未使用ならmax_intervalとし、その間は線形に補間する
+        '''
+        info = self.schedule.get(dpid)
+        if info is None:
+            return
+        low = limit_bandwidth * 2
+        if headroom <= low or bandwidth <= low:
+            interval = self.min_interval
+        else:
+            ratio = min((headroom - low) / (bandwidth - low), 1)
+            interval = self.min_interval + (self.max_interval - self.min_interval) * ratio
+        # 次回の送信時刻を新しい間隔に合わせて前倒し・延期する
+        if info["last_request"] is not None:
+            info["next_poll"] = info["last_request"] + interval
+        info["interval"] = interval
+
+    def get_status(self):
+        '''
+        Switchごとのリクエスト間隔・送信の遅れ・応答までの時間を取得する
+        '''
+        return {
+            str(dpid): {
+                "interval": info["interval"],
+                "poll_lag": info["poll_lag"],
+                "reply_latency": info["reply_latency"]
+            }
+            for dpid, info in self.schedule.items()
+        }
+
+    def __stagger(self, now):
+        '''
+        全Switchの次回の送信時刻をそれぞれの間隔内で均等にずらす
+        '''
+        dpids = sorted(self.schedule)
+        for i, dpid in enumerate(dpids):
+            info = self.schedule[dpid]
+            info["next_poll"] = now + info["interval"] * i / len(dpids)
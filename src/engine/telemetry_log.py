@@ -0,0 +1,137 @@
+import glob
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+# ファイルのヘッダ（マジック・バージョン・レコード長・レコード数）
+MAGIC = b"NSTELEM1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = 16
+# レコード（時刻・dpid・ポート番号またはフローのcookie・種別・受信と送信の使用帯域（bps））
+RECORD = struct.Struct("<dQQB7xdd")
+RECORD_DTYPE = np.dtype({
+    "names": ["timestamp", "dpid", "id", "kind", "rx_rate", "tx_rate"],
+    "formats": ["<f8", "<u8", "<u8", "u1", "<f8", "<f8"],
+    "offsets": [0, 8, 16, 24, 32, 40],
+    "itemsize": RECORD.size
+})
+# レコードの種別
+KIND_PORT = 1
+KIND_FLOW = 2
+# ファイル名（連番の順にローテーションする）
+FILE_PATTERN = "telemetry-*.bin"
+
+
+class TelemetryLog:
+    '''
+    ポート・フローの使用帯域を固定長のバイナリレコードとしてメモリマップしたファイルに追記する
+    ファイルは作成時にfile_sizeまで確保し、一杯になると次の連番のファイルにローテーションする
+    追記はメモリへの書き込みのみで、ディスクへの書き込みはOSに任せるため統計情報の処理を遅らせない
+    '''
+
+    def __init__(self, directory, file_size=64 * 1024 * 1024):
+        '''
+        初期化
+        directory: ファイルを作成するディレクトリ
+        file_size: 1ファイルのサイズ（バイト）
+        '''
+        self.directory = directory
+        self.capacity = (file_size - HEADER_SIZE) // RECORD.size
+        if self.capacity <= 0:
+            raise ValueError(f"file_size is too small: {file_size}")
+        self.file_size = HEADER_SIZE + self.capacity * RECORD.size
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # 既存のファイルを上書きしないよう、最大の連番の次から作成する（途中のファイルが削除されていても重ならない）
+        indexes = [_file_index(path) for path in glob.glob(os.path.join(directory, FILE_PATTERN))]
+        self.index = max((i for i in indexes if i is not None), default=-1) + 1
+        self.file = None
+        self.map = None
+        self.count = 0
+        self.__open()
+
+    def append(self, timestamp, dpid, record_id, kind, rx_rate, tx_rate):
+        '''
+        レコードを1件追記する
+        '''
+        with self.lock:
+            if self.count >= self.capacity:
+                self.__close()
+                self.index += 1
+                self.__open()
+            RECORD.pack_into(self.map, HEADER_SIZE + self.count * RECORD.size,
+                             timestamp, dpid, record_id, kind, rx_rate, tx_rate)
+            self.count += 1
+            COUNT.pack_into(self.map, COUNT_OFFSET, self.count)
+
+    def close(self):
+        '''
+        書き込み中のファイルを閉じる
+        '''
+        with self.lock:
+            self.__close()
+
+    def __open(self):
+        path = os.path.join(self.directory, FILE_PATTERN.replace("*", f"{self.index:05d}"))
+        self.file = open(path, "w+b")
+        # ファイルの領域を確保する（posix_fallocateがない環境ではサイズの設定のみ）
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(self.file.fileno(), 0, self.file_size)
+        else:
+            self.file.truncate(self.file_size)
+        self.map = mmap.mmap(self.file.fileno(), self.file_size)
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, RECORD.size, 0)
+        self.count = 0
+
+    def __close(self):
+        if self.map is None:
+            return
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        self.map = None
+        self.file = None
+
+
+def _file_index(path):
+    '''
+    ファイル名の連番を取得する。連番でない場合はNone
+    '''
+    suffix = os.path.basename(path)[len(FILE_PATTERN.split("*")[0]):-len(FILE_PATTERN.split("*")[1])]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def open_telemetry(path):
+    '''
+    テレメトリログのファイルを読み込み、書き込み済みのレコードをRECORD_DTYPEのnumpy配列（memmap）として取得する
+    '''
+    with open(path, "rb") as f:
+        magic, version, record_size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"not a telemetry log: {path}")
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def load_telemetry(path, kind=None):
+    '''
+    テレメトリログのディレクトリまたはファイルのレコードを連番の順に連結して取得する
+    kind: 指定した場合はその種別（KIND_PORTまたはKIND_FLOW）のレコードのみを取得する
+    '''
+    if os.path.isdir(path):
+        files = sorted((file for file in glob.glob(os.path.join(path, FILE_PATTERN)) if _file_index(file) is not None),
+                       key=_file_index)
+    else:
+        files = [path]
+    records = [open_telemetry(file) for file in files]
+    records = np.concatenate(records) if records else np.zeros(0, dtype=RECORD_DTYPE)
+    if kind is not None:
+        records = records[records["kind"] == kind]
+    return records
@@ -0,0 +1,203 @@
+import heapq
+from collections import deque
+
+from engine.utilization_matrix import UtilizationMatrix
+
+
+class TopologyGraph:
+    '''
+    LINKの定義から構築するインメモリのトポロジグラフ
+    隣接リストと各リンクの方向別の使用帯域（MB）を保持し、パス検索を行う
+    '''
+
+    def __init__(self, links, switch_names, bandwidth=100):
+        '''
+        初期化
+        links: definitions.networkのLINKと同じ形式の接続情報
+        switch_names: Switchのnode名の集合（パスの中継nodeになれるnode）
+        bandwidth: 各リンクの帯域（MB）
+        '''
+        self.bandwidth = bandwidth
+        self.switch_names = frozenset(switch_names)
+        # node名 → 隣接node名のリスト
+        self.adjacency = {}
+        # node名 → 隣接node名のうち中継nodeになれるもののリスト（パス検索でhostを展開しないために使用）
+        self.transit_adjacency = {}
+        # リンクの方向別の使用帯域
+        self.utilization = UtilizationMatrix(bandwidth)
+        for link in links:
+            self.add_link(link[0], link[2])
+
+    def add_link(self, node1, node2):
+        '''
+        node1とnode2の間にリンクを追加する
+        '''
+        self.adjacency.setdefault(node1, []).append(node2)
+        self.adjacency.setdefault(node2, []).append(node1)
+        self.transit_adjacency.setdefault(node1, [])
+        self.transit_adjacency.setdefault(node2, [])
+        if self.is_transit(node2):
+            self.transit_adjacency[node1].append(node2)
+        if self.is_transit(node1):
+            self.transit_adjacency[node2].append(node1)
+        self.utilization.add_link(node1, node2)
+
+    def update_utilization(self, node1, node2, tx_rate_mb, rx_rate_mb):
+        '''
+        node1とnode2の間のリンクの使用帯域を更新する
+        tx_rate_mb: node1からnode2方向の使用帯域
+        rx_rate_mb: node2からnode1方向の使用帯域
+        '''
+        self.utilization.update(node1, node2, tx_rate_mb, rx_rate_mb)
+
+    def add_path_utilization(self, nodes, rate_mb):
+        '''
+        パスのsrcからdst方向の各リンクの使用帯域にrate_mbを加える
+        次の統計情報で更新されるまでの間、登録したトラフィックの使用帯域を見込みで反映するために使用する
+        '''
+        self.utilization.add_path(nodes, rate_mb)
+
+    def get_utilization(self, node1, node2):
+        '''
+        node1からnode2方向の使用帯域を取得する
+        '''
+        return self.utilization.get(node1, node2)
+
+    def get_min_headroom(self, node_name):
+        '''
+        nodeに接続されているリンクの空き帯域（両方向のうち小さい方）の最小値を取得する
+        '''
+        headroom = self.bandwidth
+        for next_node in self.adjacency.get(node_name, []):
+            rate = max(self.get_utilization(node_name, next_node), self.get_utilization(next_node, node_name))
+            headroom = min(headroom, self.bandwidth - rate)
+        return headroom
+
+    def get_shortest_path(self, src_node_name, dst_node_name, filter_path=None):
+        '''
+        BFSでsrcとdst間の最短パスを取得する
+        パスが存在しない場合はNoneを返す
+        '''
+        return self.__bfs(src_node_name, dst_node_name, self.__excluded_links(filter_path), set())
+
+    def get_next_hop_table(self, dst_node_names):
+        '''
+        各dstを起点としたBFSで、全Switchから各dstへの最短パス上の次のnodeを求める
+        戻り値: {dst: {switch: 次のnode}}
+        '''
+        next_hop_table = {}
+        for dst_node_name in dst_node_names:
+            next_hops = {}
+            queue = deque([dst_node_name])
+            visited = {dst_node_name}
+            while queue:
+                node = queue.popleft()
+                # hostは中継nodeにならない
+                if node != dst_node_name and not self.is_transit(node):
+                    continue
+                for prev_node in self.adjacency.get(node, []):
+                    if prev_node in visited:
+                        continue
+                    visited.add(prev_node)
+                    if self.is_transit(prev_node):
+                        next_hops[prev_node] = node
+                    queue.append(prev_node)
+            next_hop_table[dst_node_name] = next_hops
+        return next_hop_table
+
+    def iter_shortest_paths(self, src_node_name, dst_node_name, k=None, max_hop_count=None, filter_path=None):
+        '''
+        Yenのアルゴリズムでsrcとdst間の単純パスをホップ数の小さい順に生成する
+        k: 生成するパスの最大数（Noneの場合は制限なし）
+        max_hop_count: パスのホップ数の上限（Noneの場合は制限なし）
+        filter_path: このパスに含まれるリンクを通るパスは含まない
+        呼び出し側が必要なパスを見つけた時点で生成を打ち切れるようにgeneratorとして実装
+        '''
+        excluded = self.__excluded_links(filter_path)
+        path = self.__bfs(src_node_name, dst_node_name, excluded, set())
+        found = []
+        candidates = []
+        candidate_set = set()
+        count = 0
+        # 直前のパスが元のパスから分岐したnodeのindex
+        deviation = 0
+        while path is not None:
+            if max_hop_count is not None and len(path) - 1 > max_hop_count:
+                return
+            yield path
+            found.append(path)
+            count += 1
+            if k is not None and count >= k:
+                return
+            # 直前のパスの各nodeを分岐点として迂回パスを候補に追加
+            # 分岐点より前のnodeからの迂回パスは、直前のパスの元になったパスで候補に追加済みのため検索しない（Lawlerの改良）
+            for i in range(deviation, len(path) - 1):
+                root_path = path[:i + 1]
+                spur_excluded = set(excluded)
+                for p in found:
+                    if p[:i + 1] == root_path:
+                        spur_excluded.add((p[i], p[i + 1]))
+                        spur_excluded.add((p[i + 1], p[i]))
+                spur_path = self.__bfs(path[i], dst_node_name, spur_excluded, set(root_path[:-1]))
+                if spur_path is None:
+                    continue
+                candidate = tuple(root_path[:-1] + spur_path)
+                if candidate in candidate_set:
+                    continue
+                candidate_set.add(candidate)
+                heapq.heappush(candidates, (len(candidate), candidate, i))
+            if not candidates:
+                return
+            _, path, deviation = heapq.heappop(candidates)
+            path = list(path)
+
+    def __bfs(self, src_node_name, dst_node_name, excluded_links, excluded_nodes):
+        '''
+        excluded_linksのリンクとexcluded_nodesのnodeを通らない最短パスをBFSで取得する
+        '''
+        # 探索済みのnode → パス上の1つ前のnode（excluded_nodesは探索済みとして扱う）
+        previous = dict.fromkeys(excluded_nodes)
+        previous[src_node_name] = None
+        transit_adjacency = self.transit_adjacency
+        # dstに隣接するnode（パスのdstの1つ前のnode）
+        last_hops = set(self.adjacency.get(dst_node_name, ()))
+        # 同じホップ数のnodeを探索した順に並べたリストを1段ずつたどる
+        frontier = [src_node_name]
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                # dstに到達できる最初のnodeで最短パスが決まるため、dstを探索せずに返す
+                if node in last_hops and not (excluded_links and (node, dst_node_name) in excluded_links):
+                    path = [dst_node_name]
+                    while node is not None:
+                        path.append(node)
+                        node = previous[node]
+                    return path[::-1]
+                # hostは中継nodeにならないため、中継nodeになれる隣接nodeのみ探索する
+                for next_node in transit_adjacency.get(node, ()):
+                    if next_node in previous:
+                        continue
+                    if excluded_links and (node, next_node) in excluded_links:
+                        continue
+                    previous[next_node] = node
+                    next_frontier.append(next_node)
+            frontier = next_frontier
+        return None
+
+    def is_transit(self, node_name):
+        '''
+        パスの中継nodeになれるか（Switchか）を判定する
+        '''
+        return node_name in self.switch_names
+
+    @staticmethod
+    def __excluded_links(filter_path):
+        '''
+        filter_pathに含まれるリンクを両方向のnodeの組のsetに変換する
+        '''
+        excluded = set()
+        if filter_path:
+            for i in range(len(filter_path) - 1):
+                excluded.add((filter_path[i], filter_path[i + 1]))
+                excluded.add((filter_path[i + 1], filter_path[i]))
+        return excluded
@@ -0,0 +1,82 @@
+class TopologyIndex:
+    '''
+    LINK・HOST_LISTの定義とdatapathから構築するO(1)参照用のインデックス
+    ports: (node1, node2) → (node1側のport, node2側のport)
+    neighbors: (switch, port) → そのportに接続されているnode
+    mac_to_host: macアドレス → host名
+    host_to_mac: host名 → macアドレス
+    datapaths: dpid → datapath
+    '''
+
+    def __init__(self, links, hosts):
+        '''
+        初期化
+        links: definitions.networkのLINKと同じ形式の接続情報
+        hosts: definitions.hostのHOST_LISTと同じ形式のhost情報
+        '''
+        self.ports = {}
+        self.neighbors = {}
+        self.mac_to_host = {}
+        self.host_to_mac = {}
+        self.datapaths = {}
+        self.build(links, hosts)
+
+    def build(self, links, hosts):
+        '''
+        トポロジの定義からインデックスを作り直す（datapathの情報は保持する）
+        '''
+        self.ports.clear()
+        self.neighbors.clear()
+        self.mac_to_host.clear()
+        self.host_to_mac.clear()
+        for link in links:
+            self.add_link(link)
+        for host in hosts:
+            self.add_host(host)
+
+    def add_link(self, link):
+        '''
+        リンク情報（["s1", "1", "h1", "1"]の形式）をインデックスに追加する
+        '''
+        node1, port1, node2, port2 = link
+        self.ports[(node1, node2)] = (port1, port2)
+        self.ports[(node2, node1)] = (port2, port1)
+        self.neighbors[(node1, port1)] = node2
+        self.neighbors[(node2, port2)] = node1
+
+    def add_host(self, host):
+        '''
+        host情報をインデックスに追加する
+        '''
+        self.mac_to_host[host["mac"]] = host["name"]
+        self.host_to_mac[host["name"]] = host["mac"]
+
+    def register_datapath(self, datapath):
+        '''
+        datapathを登録する
+        '''
+        self.datapaths[datapath.id] = datapath
+
+    def unregister_datapath(self, dpid):
+        '''
+        datapathの登録を削除する
+        '''
+        self.datapaths.pop(dpid, None)
+
+    def get_port(self, node1, node2):
+        '''
+        node1とnode2の接続ポート情報を(node1側のport, node2側のport)として取得
+        '''
+        return self.ports[(node1, node2)]
+
+    def get_neighbor(self, switch_name, port):
+        '''
+        Switchの該当ポートに接続されているnodeを取得。接続されていない場合はNone
+        '''
+        return self.neighbors.get((switch_name, port))
+
+    def get_datapath(self, switch_name):
+        '''
+        Switchに対応するdatapathを取得
+        '''
+        return self.datapaths.get(int(switch_name[1:]))
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class UtilizationMatrix:
+    '''
+    リンクの方向別の使用帯域（MB）を整数idで管理する配列
+    nodeとリンクに整数idを割り当て、使用帯域はリンクidをindexとする配列で保持する
+    パスはリンクidの配列として表し、複数パスの空き帯域をまとめて計算する
+    '''
+
+    def __init__(self, bandwidth=100):
+        '''
+        初期化
+        bandwidth: 各リンクの帯域（MB）
+        '''
+        self.bandwidth = bandwidth
+        # node名 → node id
+        self.node_ids = {}
+        # (node1, node2) → node1からnode2方向のリンクid
+        self.link_ids = {}
+        # リンクidごとの使用帯域。末尾はパスの長さを揃えるための使用帯域0の番兵
+        self.utilization = np.zeros(1)
+
+    @property
+    def sentinel(self):
+        '''
+        番兵のindex
+        '''
+        return len(self.utilization) - 1
+
+    def add_node(self, node_name):
+        '''
+        nodeにidを割り当てる
+        '''
+        return self.node_ids.setdefault(node_name, len(self.node_ids))
+
+    def add_link(self, node1, node2):
+        '''
+        node1とnode2の間の両方向のリンクにidを割り当てる
+        '''
+        self.add_node(node1)
+        self.add_node(node2)
+        if (node1, node2) in self.link_ids:
+            return
+        self.link_ids[(node1, node2)] = self.sentinel
+        self.link_ids[(node2, node1)] = self.sentinel + 1
+        self.utilization = np.concatenate([self.utilization[:-1], np.zeros(3)])
+
+    def update(self, node1, node2, tx_rate_mb, rx_rate_mb):
+        '''
+        node1とnode2の間のリンクの使用帯域を更新する
+        '''
+        self.utilization[self.link_ids[(node1, node2)]] = tx_rate_mb
+        self.utilization[self.link_ids[(node2, node1)]] = rx_rate_mb
+
+    def add_path(self, nodes, rate_mb):
+        '''
+        パスのnodesの順の方向の各リンクの使用帯域にrate_mbを加える（0を下回る場合は0とする）
+        '''
+        index = self.path_to_index(nodes)
+        self.utilization[index] = np.maximum(self.utilization[index] + rate_mb, 0)
+
+    def get(self, node1, node2):
+        '''
+        node1からnode2方向の使用帯域を取得する
+        '''
+        link_id = self.link_ids.get((node1, node2))
+        return 0 if link_id is None else float(self.utilization[link_id])
+
+    def path_to_index(self, nodes):
+        '''
+        パスのnodeのリストをリンクidの配列に変換する
+        '''
+        link_ids = self.link_ids
+        return np.fromiter((link_ids[(nodes[i], nodes[i + 1])] for i in range(len(nodes) - 1)),
+                           dtype=np.int64, count=len(nodes) - 1)
+
+    def to_matrix(self, index_arrays):
+        '''
+        リンクidの配列のリストを番兵で長さを揃えた2次元配列に変換する
+        '''
+        width = max((len(index) for index in index_arrays), default=0)
+        matrix = np.full((len(index_arrays), width), self.sentinel, dtype=np.int64)
+        for i, index in enumerate(index_arrays):
+            matrix[i, :len(index)] = index
+        return matrix
+
+    def score_paths(self, matrix, limit_bandwidth):
+        '''
+        to_matrixで変換した複数パスの空き帯域をまとめて計算する
+        戻り値: (各パスの利用できる帯域の配列, 各ホップの空き帯域がlimit_bandwidthを下回るかの2次元配列)
+        '''
+        rates = self.utilization[matrix]
+        min_bandwidth = self.bandwidth - rates.max(axis=1, initial=0)
+        exceeded = ((self.bandwidth - rates) < limit_bandwidth) & (matrix != self.sentinel)
+        return min_bandwidth, exceeded
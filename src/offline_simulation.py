@@ -0,0 +1,461 @@
+import argparse
+import heapq
+import time
+
+from definitions.topology import load_topology
+from analysis import Analyzer
+from engine.reroute_planner import PathSelectAlgorithm, ReroutePlanner
+from engine.route_cache import RouteCache
+from engine.topology_graph import TopologyGraph
+from result_record import ResultWriter, create_record
+from traffic_registry import TrafficRegistry
+from workload import Workload, load_trace, save_trace
+
+# ビデオストリームと他トラフィックの最低保障帯域（controller.pyと同じ値）
+LIMIT_VIDEO_BANDWIDTH = 20
+LIMIT_OTHER_BANDWIDTH = 20
+# 他トラフィックの候補パス数とホップ数の上限（controller.pyと同じ値）
+K_SHORTEST_PATHS = 8
+MAX_HOP_COUNT = None
+# コントローラーが使用帯域を取得する間隔（秒）
+STATS_INTERVAL = 10
+# リンクの帯域（Mbps）
+BANDWIDTH = 100
+
+
+class FluidNetwork:
+    '''
+    各トラフィックを流量として扱うネットワークのモデル
+    ビデオストリームは指定したレートで流れ、他トラフィックは残りの帯域をmax-min公平に分け合う
+    max-min公平な割り当てはリンクを共有するトラフィックの連結成分ごとに独立しているため、
+    前回の割り当て以降に追加・変更・削除されたトラフィックのリンクを含む連結成分のみを計算し直す
+    '''
+
+    def __init__(self, bandwidth=BANDWIDTH):
+        '''
+        初期化
+        '''
+        self.bandwidth = bandwidth
+        # トラフィックのkey → {"type", "nodes", "hops", "demand", "remaining", "rate"}
+        self.flows = {}
+        # リンク → 通るビデオストリームのレートの合計
+        self.video_load = {}
+        # リンク → ビデオストリームのレートを除いた他トラフィックに割り当てられる帯域
+        self.capacity = {}
+        # リンク → 通る他トラフィックのkeyの集合
+        self.link_flows = {}
+        # 前回の割り当て以降にトラフィックが変わったリンク
+        self.dirty = set()
+
+    def add_flow(self, key, traffic_type, nodes, demand=0, remaining=0):
+        '''
+        トラフィックを追加する
+        demand: ビデオストリームのレート（Mbps）
+        remaining: 他トラフィックの残りのデータ量（Mbit）
+        '''
+        flow = self.flows[key] = {
+            "type": traffic_type,
+            "nodes": nodes,
+            "hops": self.__to_hops(nodes),
+            "demand": demand,
+            "remaining": remaining,
+            "rate": demand if traffic_type == "video" else 0
+        }
+        self.__attach(key, flow)
+
+    def move_flow(self, key, nodes):
+        '''
+        トラフィックのパスを変更する
+        '''
+        flow = self.flows[key]
+        self.__detach(key, flow)
+        flow["nodes"] = nodes
+        flow["hops"] = self.__to_hops(nodes)
+        self.__attach(key, flow)
+
+    def remove_flow(self, key):
+        '''
+        トラフィックを削除する
+        '''
+        flow = self.flows.pop(key, None)
+        if flow is not None:
+            self.__detach(key, flow)
+        return flow
+
+    def allocate(self):
+        '''
+        各トラフィックのレートを計算する
+        ビデオストリームのレートを除いた各リンクの残りの帯域を、他トラフィックにmax-min公平に割り当てる
+        計算するのは変更があったリンクから他トラフィックとリンクをたどった連結成分のみ
+        '''
+        if not self.dirty:
+            return
+        link_flows = self.link_flows
+        # 変更があったリンクを含む連結成分のリンクとトラフィック
+        component = set()
+        keys = set()
+        stack = [hop for hop in self.dirty if hop in link_flows]
+        component.update(stack)
+        while stack:
+            for key in link_flows[stack.pop()]:
+                if key in keys:
+                    continue
+                keys.add(key)
+                for hop in self.flows[key]["hops"]:
+                    if hop not in component:
+                        component.add(hop)
+                        stack.append(hop)
+        self.dirty = set()
+        count = {hop: len(link_flows[hop]) for hop in component}
+        link_capacity = self.capacity
+        capacity = {hop: link_capacity[hop] for hop in component}
+        fixed = set()
+        # 1トラフィックあたりの帯域はレートの確定により減らないため、古い値は取り出した時に更新する
+        heap = [(capacity[hop] / n, hop) for hop, n in count.items()]
+        heapq.heapify(heap)
+        while heap and len(fixed) < len(keys):
+            # 1トラフィックあたりの帯域が最も小さいリンクのトラフィックのレートを確定する
+            share, hop = heapq.heappop(heap)
+            if hop not in count:
+                continue
+            current = capacity[hop] / count[hop]
+            if current > share:
+                heapq.heappush(heap, (current, hop))
+                continue
+            for key in link_flows[hop]:
+                if key in fixed:
+                    continue
+                fixed.add(key)
+                flow = self.flows[key]
+                flow["rate"] = share
+                for h in flow["hops"]:
+                    capacity[h] -= share
+                    count[h] -= 1
+                    if count[h] == 0:
+                        del count[h]
+
+    def __attach(self, key, flow):
+        '''
+        トラフィックをリンクごとの情報に登録する
+        '''
+        for hop in flow["hops"]:
+            if flow["type"] == "video":
+                self.video_load[hop] = self.video_load.get(hop, 0) + flow["demand"]
+                self.__update_capacity(hop)
+            else:
+                self.link_flows.setdefault(hop, set()).add(key)
+                self.capacity.setdefault(hop, self.bandwidth)
+        self.dirty.update(flow["hops"])
+
+    def __detach(self, key, flow):
+        '''
+        トラフィックをリンクごとの情報から削除する
+        '''
+        for hop in flow["hops"]:
+            if flow["type"] == "video":
+                self.video_load[hop] -= flow["demand"]
+                self.__update_capacity(hop)
+            else:
+                keys = self.link_flows[hop]
+                keys.discard(key)
+                if not keys:
+                    del self.link_flows[hop]
+        self.dirty.update(flow["hops"])
+
+    def __update_capacity(self, hop):
+        '''
+        リンクのビデオストリームのレートの合計が変わった時に、他トラフィックに割り当てられる帯域を更新する
+        '''
+        self.capacity[hop] = max(self.bandwidth - self.video_load[hop], 0)
+
+    def advance(self, duration):
+        '''
+        duration秒だけ時間を進め、他トラフィックの残りのデータ量を減らす
+        '''
+        for flow in self.flows.values():
+            if flow["type"] != "video":
+                flow["remaining"] = max(flow["remaining"] - flow["rate"] * duration, 0)
+
+    def next_completion(self):
+        '''
+        次に完了する他トラフィックまでの時間とそのkeyを取得する
+        '''
+        result = (float("inf"), None)
+        for key, flow in self.flows.items():
+            if flow["type"] != "video" and flow["rate"] > 0:
+                result = min(result, (flow["remaining"] / flow["rate"], key))
+        return result
+
+    def get_link_load(self):
+        '''
+        リンクの方向ごとの使用帯域を取得する
+        '''
+        load = {}
+        for flow in self.flows.values():
+            for hop in flow["hops"]:
+                load[hop] = load.get(hop, 0) + flow["rate"]
+        return load
+
+    @staticmethod
+    def __to_hops(nodes):
+        return [(nodes[i], nodes[i + 1]) for i in range(len(nodes) - 1)]
+
+
+class OfflineSimulation:
+    '''
+    Mininetを使用せずにシミュレーション上の時間でトラフィックを発生させ、経路選択と切り替えを評価する
+    経路選択・切り替えはコントローラーと同じTopologyGraph・RouteCache・ReroutePlannerを使用する
+    '''
+
+    def __init__(self, algorithm=PathSelectAlgorithm.BANDWIDTH, workload=None, num_traffic=100,
+                 stats_interval=STATS_INTERVAL, topology=None):
+        '''
+        初期化
+        algorithm: 切り替えアルゴリズム
+        workload: トラフィックの発生要求（TrafficRequest）を発生時刻の順に返すiterable。Noneの場合は既定のWorkload
+        num_traffic: 通信を行うトラフィック数。workloadが先に尽きた場合はそこで終了する
+        stats_interval: コントローラーが使用帯域を取得する間隔（秒）。0の場合は常に最新の使用帯域を使用する
+        topology: definitions.topologyのTopology。Noneの場合は環境変数TOPOLOGYで指定されたトポロジ
+        '''
+        if topology is None:
+            topology = load_topology()
+        if workload is None:
+            workload = Workload(video_server=topology.video_server, client=topology.client)
+        self.algorithm = algorithm
+        self.workload = iter(workload)
+        self.num_traffic = num_traffic
+        self.stats_interval = stats_interval
+        self.topology = TopologyGraph(topology.links, topology.switch_names, BANDWIDTH)
+        self.route_cache = RouteCache(self.topology, K_SHORTEST_PATHS, MAX_HOP_COUNT)
+        self.reroute_planner = ReroutePlanner(self.topology, LIMIT_VIDEO_BANDWIDTH, LIMIT_OTHER_BANDWIDTH,
+                                              K_SHORTEST_PATHS, MAX_HOP_COUNT)
+        self.network = FluidNetwork(BANDWIDTH)
+        # コントローラーが管理する他トラフィックのパスと使用帯域
+        self.other_traffic = {}
+        self.other_traffic_rate = {}
+        # 通信中のトラフィック
+        self.traffic = TrafficRegistry()
+        # トラフィックごとの結果
+        self.results = []
+        # 発生させようとしたトラフィックの発生要求
+        self.offered = []
+        self.now = 0
+        self.events = []
+        self.event_count = 0
+
+    def run(self):
+        '''
+        シミュレーションの実行
+        '''
+        # 次のトラフィックの発生要求が登録されているか
+        arriving = self.__push_arrival()
+        if self.stats_interval > 0:
+            self.__push(0, "stats", None)
+        count = 0
+        while True:
+            wait, key = self.network.next_completion()
+            next_event = self.events[0][0] if self.events else float("inf")
+            if not arriving and not self.network.flows:
+                break
+            if self.now + wait <= next_event:
+                if key is None:
+                    break
+                self.__advance(self.now + wait)
+                self.__complete_other_traffic(key)
+            else:
+                at, _, kind, data = heapq.heappop(self.events)
+                self.__advance(at)
+                if kind == "arrival":
+                    count += self.__arrival(data)
+                    arriving = count < self.num_traffic and self.__push_arrival()
+                elif kind == "video_end":
+                    self.__complete_video_traffic(data)
+                elif kind == "stats":
+                    self.__update_stats()
+                    if arriving or self.network.flows:
+                        self.__push(self.now + self.stats_interval, "stats", None)
+            self.network.allocate()
+            if self.stats_interval == 0:
+                self.__update_stats()
+        return self.results
+
+    def summary(self):
+        '''
+        Mininetでのシミュレーションの結果と同じくanalysis.pyで集計し、スキップしたトラフィックの件数を加える
+        '''
+        analyzer = Analyzer()
+        for record in self.results:
+            analyzer.add(record)
+        summary = analyzer.summary()
+        summary["skipped"] = self.traffic.get_stats()["skipped"]
+        return summary
+
+    def __arrival(self, request):
+        '''
+        sim_topology.pyのexec_simulationと同じ規則でトラフィックを発生させる
+        トラフィックを発生させた場合は1、スキップした場合は0を返す
+        '''
+        self.offered.append(request)
+        src_host, dst_host = f"h{request.start_node + 1}", f"h{request.end_node + 1}"
+        # 送信ノードがすでに送信中、またはそのノード間で通信中の場合はスキップ
+        if self.traffic.reserve(src_host, dst_host):
+            return 0
+        if request.type == "video":
+            self.__video_traffic(src_host, dst_host, request.stream_rate, request.stream_period)
+        else:
+            self.__other_traffic(src_host, dst_host, request.data_size)
+        return 1
+
+    def __video_traffic(self, src_host, dst_host, stream_rate, stream_period):
+        '''
+        ビデオストリームのパスを選択し、通信を開始する
+        '''
+        key = f"{src_host}{dst_host}"
+        try:
+            info = self.route_cache.get_path_info_list(src_host, dst_host, LIMIT_VIDEO_BANDWIDTH, shortest_only=True)[0]
+            # 最短パスの帯域が最低保証帯域を下回っている場合は他トラフィックを切り替える
+            if info.min_bandwidth < LIMIT_VIDEO_BANDWIDTH:
+                self.__modify_other_traffic(info)
+        except Exception:
+            self.results.append(create_record("video", src_host, dst_host, self.now, self.now, "fail"))
+            self.traffic.release(src_host, dst_host)
+            return
+        self.network.add_flow(key, "video", info.nodes, demand=stream_rate)
+        self.__push(self.now + stream_period, "video_end", (key, src_host, dst_host, self.now, stream_rate))
+
+    def __other_traffic(self, src_host, dst_host, data_size):
+        '''
+        他トラフィックのパスを選択し、通信を開始する
+        '''
+        key = f"{src_host}{dst_host}"
+        nodes = self.__select_other_path(src_host, dst_host)
+        if nodes is None:
+            self.results.append(create_record("other", src_host, dst_host, self.now, self.now, "fail"))
+            self.traffic.release(src_host, dst_host)
+            return
+        self.other_traffic[key] = nodes
+        self.network.add_flow(key, "other", nodes, remaining=data_size * 8)
+        self.network.flows[key]["start"] = self.now
+        self.network.flows[key]["size"] = data_size
+
+    def __select_other_path(self, src_host, dst_host, filter_path=None):
+        '''
+        他トラフィックの最低保障帯域を満たす最もホップ数の小さいパスを選択する
+        '''
+        for info in self.route_cache.iter_path_info(src_host, dst_host, LIMIT_VIDEO_BANDWIDTH, filter_path):
+            if info.min_bandwidth >= LIMIT_OTHER_BANDWIDTH:
+                return info.nodes
+        return None
+
+    def __modify_other_traffic(self, info):
+        '''
+        コントローラーと同じ切り替えアルゴリズムで他トラフィックを切り替える
+        切り替え先のパスがない場合はExceptionを送出する
+        '''
+        plan = self.reroute_planner.plan(self.algorithm, info, self.other_traffic, self.other_traffic_rate)
+        for key, nodes in plan:
+            current = self.other_traffic[key]
+            if not nodes:
+                nodes = self.__select_other_path(current[0], current[-1], info.nodes)
+                if nodes is None:
+                    raise Exception("found no path with enough bandwidth")
+            self.other_traffic[key] = nodes
+            self.network.move_flow(key, nodes)
+
+    def __complete_video_traffic(self, data):
+        '''
+        ビデオストリームの終了
+        '''
+        key, src_host, dst_host, start, stream_rate = data
+        flow = self.network.remove_flow(key)
+        self.traffic.release(src_host, dst_host)
+        num_bytes = stream_rate * (self.now - start) * 1024 * 1024 / 8
+        self.results.append(create_record("video", src_host, dst_host, start, self.now, "success",
+                                          num_bytes=num_bytes, path=flow["nodes"], stream_rate=stream_rate))
+
+    def __complete_other_traffic(self, key):
+        '''
+        他トラフィックの終了
+        '''
+        flow = self.network.remove_flow(key)
+        nodes = flow["nodes"]
+        self.traffic.release(nodes[0], nodes[-1])
+        self.other_traffic.pop(key, None)
+        self.other_traffic_rate.pop(key, None)
+        self.results.append(create_record("other", nodes[0], nodes[-1], flow["start"], self.now, "success",
+                                          num_bytes=flow["size"] * 1024 * 1024, path=nodes))
+
+    def __update_stats(self):
+        '''
+        コントローラーの統計情報の取得と同様に、現在の使用帯域をトポロジグラフと他トラフィックの使用帯域に反映する
+        '''
+        load = self.network.get_link_load()
+        for node1, node2 in self.topology.utilization.link_ids:
+            if node1 < node2:
+                self.topology.update_utilization(node1, node2, load.get((node1, node2), 0), load.get((node2, node1), 0))
+        self.route_cache.bump_epoch()
+        self.other_traffic_rate = {
+            key: {"tx_rate": flow["rate"] * 1024 * 1024}
+            for key, flow in self.network.flows.items() if flow["type"] == "other"
+        }
+
+    def __advance(self, at):
+        self.network.advance(at - self.now)
+        self.now = at
+
+    def __push_arrival(self):
+        '''
+        次のトラフィックの発生要求をイベントに登録する。workloadが尽きた場合はFalseを返す
+        '''
+        request = next(self.workload, None)
+        if request is None:
+            return False
+        self.__push(max(request.at, self.now), "arrival", request)
+        return True
+
+    def __push(self, at, kind, data):
+        self.event_count += 1
+        heapq.heappush(self.events, (at, self.event_count, kind, data))
+
+
+
+if '__main__' == __name__:
+
+    parser = argparse.ArgumentParser(description="Mininetを使用しないオフラインのシミュレーション")
+    parser.add_argument("--algorithm", default="BANDWIDTH", choices=[a.name for a in PathSelectAlgorithm])
+    parser.add_argument("--traffic", type=int, default=100, help="発生させるトラフィック数")
+    parser.add_argument("--arrival", default="fixed", choices=["fixed", "poisson"], help="トラフィックの発生間隔の分布")
+    parser.add_argument("--inter-arrival", type=float, default=1, help="トラフィックの発生間隔（秒）")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL, help="使用帯域を取得する間隔（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace", default=None, help="再現するトレースファイル")
+    parser.add_argument("--save-trace", default=None, help="発生させたトラフィックを保存するトレースファイル")
+    parser.add_argument("--output", default=None, help="トラフィックごとの結果を書き込むJSON Linesのファイル")
+    parser.add_argument("--topology", default=None, help="トポロジの指定（省略した場合は環境変数TOPOLOGY）。例：fat_tree:k=8")
+    args = parser.parse_args()
+
+    topology = load_topology(args.topology)
+    if args.trace:
+        params, workload = load_trace(args.trace)
+    else:
+        generator = Workload(args.arrival, args.inter_arrival, video_server=topology.video_server,
+                             client=topology.client, seed=args.seed)
+        params, workload = generator.get_params(), generator
+    simulation = OfflineSimulation(PathSelectAlgorithm[args.algorithm], workload, args.traffic, args.stats_interval,
+                                   topology)
+    started = time.perf_counter()
+    simulation.run()
+    elapsed = time.perf_counter() - started
+    if args.save_trace:
+        save_trace(args.save_trace, simulation.offered, params)
+    if args.output:
+        writer = ResultWriter(args.output)
+        for record in simulation.results:
+            writer.write(record)
+        writer.close()
+    summary = simulation.summary()
+    print(f"ビデオ棄却率：{summary['failed_video_rate']:.3f} %")
+    print(f"他トラフィック棄却率：{summary['failed_other_rate']:.3f} %")
+    print(f"他トラフィック平均通信速度：{summary['other_traffic_rate']:.3f} Mbps")
+    print(f"スキップ：{summary['skipped']}")
+    print(f"実行時間：{elapsed:.3f} 秒（{args.traffic / elapsed:.0f} トラフィック/秒）")
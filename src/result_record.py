@@ -0,0 +1,117 @@
+import json
+import threading
+
+# iperfの-y Cの出力の列
+# timestamp,送信元ip,送信元port,宛先ip,宛先port,id,区間,バイト数,bps[,jitter(ms),損失数,送信数,損失率(%),順序逆転数]
+IPERF_INTERVAL_INDEX = 6
+IPERF_BYTES_INDEX = 7
+IPERF_BPS_INDEX = 8
+# UDPのサーバレポートの列数
+IPERF_SERVER_REPORT_FIELDS = 14
+
+
+class ResultWriter:
+    '''
+    トラフィックごとの結果を1行1レコードのJSON Linesとして追記する
+    複数のスレッドから呼び出されるため、1レコードの書き込みはロックで排他する
+    '''
+
+    def __init__(self, path):
+        '''
+        初期化
+        path: 追記するファイルのパス
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", buffering=1)
+
+    def write(self, record):
+        '''
+        レコードを1行追記する
+        '''
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+        '''
+        ファイルを閉じる
+        '''
+        with self.lock:
+            self.file.close()
+
+
+def create_record(traffic_type, src_host, dst_host, start, end, result,
+                  setup_latency=None, num_bytes=0, path=None, duration=None, **kwargs):
+    '''
+    トラフィックごとの結果のレコードを作成する
+    start / end: 通信の開始・終了時刻（秒）。フローのアップデートに失敗した場合は同じ値
+    setup_latency: フローのアップデートのリクエストから応答までの時間（秒）
+    num_bytes: 転送したバイト数
+    path: コントローラーが選択したパス（node名のリスト）
+    duration: 転送速度の計算に使用する通信時間（秒）。省略した場合はend - start
+    転送速度rateはMbps（1Mbit = 1024 * 1024bit。analysis.shと同じ単位）で記録する
+    kwargs: 追加の項目（iperfの区間ごとの転送速度・jitter・損失率など）
+    '''
+    if duration is None:
+        duration = end - start
+    record = {
+        "type": traffic_type,
+        "src_host": src_host,
+        "dst_host": dst_host,
+        "start": start,
+        "end": end,
+        "setup_latency": setup_latency,
+        "bytes": num_bytes,
+        "duration": duration,
+        "rate": num_bytes * 8 / 1024 / 1024 / duration if duration > 0 else 0,
+        "result": result,
+        "path": path
+    }
+    record.update(kwargs)
+    return record
+
+
+def parse_iperf_csv(output):
+    '''
+    iperf -y C の出力を解析する
+    戻り値: {"intervals": 区間ごとの{"start", "end", "bytes", "rate"}のリスト,
+            "bytes": 合計のバイト数, "duration": 通信時間（秒）,
+            "jitter": jitter（ms）, "loss": 損失率（%）}
+    区間ごとの値はクライアント側の報告、jitter・損失率はUDPの場合のサーバレポートの値（TCPの場合はNone）
+    '''
+    reports = []
+    server_report = None
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) <= IPERF_BPS_INDEX:
+            continue
+        try:
+            start, end = (float(v) for v in fields[IPERF_INTERVAL_INDEX].split("-"))
+            report = {
+                "start": start,
+                "end": end,
+                "bytes": int(fields[IPERF_BYTES_INDEX]),
+                "rate": float(fields[IPERF_BPS_INDEX]) / 1024 / 1024
+            }
+        except ValueError:
+            continue
+        if len(fields) >= IPERF_SERVER_REPORT_FIELDS:
+            report["jitter"] = float(fields[9])
+            report["loss"] = float(fields[12])
+            server_report = report
+        else:
+            reports.append(report)
+    # 最後の行は全体の集計。区間が1つの場合は区間の報告を兼ねる
+    summary = reports[-1] if reports else None
+    intervals = reports[:-1] if len(reports) > 1 else reports
+    if server_report is not None:
+        # UDPの受信側のバイト数はサーバレポートの値を使用する
+        summary = server_report
+    return {
+        "intervals": intervals,
+        "bytes": summary["bytes"] if summary else 0,
+        "duration": summary["end"] - summary["start"] if summary else 0,
+        "jitter": server_report["jitter"] if server_report else None,
+        "loss": server_report["loss"] if server_report else None
+    }
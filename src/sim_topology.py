@@ -1,13 +1,12 @@
 import os
 import json
+import asyncio
 from concurrent import futures
 import time
+import argparse
 from datetime import datetime
-import copy
 
-import requests
-
-import random
+import aiohttp
 
 from mininet.cli import CLI
 from mininet.net import Mininet
@@ -16,11 +15,12 @@ from mininet.term import makeTerm
 from mininet.link import TCLink
 from mininet.util import custom
 
-from py2neo import Graph, Node, Relationship
+from py2neo import Graph
 
-from definitions.network import LINK
-from definitions.host import HOST_LIST, NUM_HOST
-from definitions.switch import SWITCH_LIST, NUM_SWITCH
+from definitions.topology import load_topology
+from result_record import ResultWriter, create_record, parse_iperf_csv
+from traffic_registry import TrafficRegistry
+from workload import Workload, load_trace, save_trace
 
 # neo4jのdatabaseのパスワードを環境変数から取得
 DB_PASS = os.getenv("DB_PASS", "password")
@@ -28,20 +28,107 @@ DB_PASS = os.getenv("DB_PASS", "password")
 PORT = 6633
 
 # フローコントローラーのREST APIのURI
-OTHER_TRAFFIC_FLOW_UPDATE = 'http://127.0.0.1:8080/controller/other/flowtable'
-VIDEO_TRAFFIC_FLOW_UPDATE = 'http://127.0.0.1:8080/controller/video/flowtable'
-OTHER_TRAFFIC_FLOW_COMPLETE = 'http://127.0.0.1:8080/controller/other/complete'
+CONTROLLER_URL = 'http://127.0.0.1:8080'
+OTHER_TRAFFIC_FLOW_UPDATE = '/controller/other/flowtable'
+VIDEO_TRAFFIC_FLOW_UPDATE = '/controller/video/flowtable'
+OTHER_TRAFFIC_FLOW_COMPLETE = '/controller/other/complete'
+VIDEO_TRAFFIC_FLOW_COMPLETE = '/controller/video/complete'
+# フローコントローラーへの接続数・タイムアウト（秒）・接続失敗時のリトライ回数
+CONTROLLER_POOL_SIZE = 10
+CONTROLLER_TIMEOUT = 30
+CONTROLLER_RETRIES = 3
+# neo4jへの1回のクエリでまとめて作成・削除するnode・リンクの数
+NEO4J_BATCH_SIZE = 1000
+# 通信を行うトラフィック数
+NUM_TRAFFIC = 100
 
 # ログ設定
 LOG_DIR = "results/" + datetime.now().strftime("%m%d%H%M%S")
 os.makedirs(LOG_DIR)
+# トラフィックごとの結果を書き込むJSON Linesのファイル
+RESULT_FILE = f"{LOG_DIR}/results.jsonl"
+# iperfの転送速度の報告間隔（秒）
+IPERF_INTERVAL = 1
+
+
+class ControllerClient:
+    '''
+    フローコントローラーのREST APIの非同期クライアント
+    接続はプールし、asyncioのイベントループで実行する全てのトラフィックで使い回す
+    '''
+
+    def __init__(self, base_url=CONTROLLER_URL, pool_size=CONTROLLER_POOL_SIZE,
+                 timeout=CONTROLLER_TIMEOUT, retries=CONTROLLER_RETRIES):
+        '''
+        初期化
+        pool_size: コントローラーへの最大接続数。超えた分のリクエストは接続が空くまで待つ
+        timeout: リクエストのタイムアウト（秒）
+        retries: 接続に失敗した場合のリトライ回数
+        '''
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        # セッションはイベントループ内で作成する必要があるため、最初の呼び出し時に作成する
+        self.session = None
+
+    async def post(self, path, payload):
+        '''
+        REST APIを呼び出し、応答のjsonを返す
+        フローの二重登録を避けるため、リトライは接続の失敗時のみ行う
+        '''
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        for i in range(self.retries + 1):
+            try:
+                async with self.session.post(self.base_url + path, data=json.dumps(payload)) as res:
+                    return await res.json(content_type=None)
+            except aiohttp.ClientConnectionError:
+                if i == self.retries:
+                    raise
+                await asyncio.sleep(0.1 * 2 ** i)
+
+    async def update_flow(self, traffic_type, src_host, dst_host):
+        '''
+        トラフィックのフローのアップデートをリクエストする
+        '''
+        return await self.post(self.__flow_update_path(traffic_type), {"src_host": src_host, "dst_host": dst_host})
+
+    async def complete_other_traffic(self, src_host, dst_host):
+        '''
+        他トラフィックの完了をリクエストする
+        '''
+        return await self.post(OTHER_TRAFFIC_FLOW_COMPLETE, {"src_host": src_host, "dst_host": dst_host})
+
+    async def complete_video_traffic(self, src_host, dst_host):
+        '''
+        ビデオトラフィックの完了をリクエストする
+        '''
+        return await self.post(VIDEO_TRAFFIC_FLOW_COMPLETE, {"src_host": src_host, "dst_host": dst_host})
+
+    async def close(self):
+        '''
+        プールしている接続を閉じる
+        '''
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @staticmethod
+    def __flow_update_path(traffic_type):
+        return VIDEO_TRAFFIC_FLOW_UPDATE if traffic_type == "video" else OTHER_TRAFFIC_FLOW_UPDATE
 
 
 class L2Network:
-    def __init__(self):
+    def __init__(self, topology):
         '''
         初期設定
+        topology: definitions.topologyのTopology（コントローラーと同じトポロジを指定する）
         '''
+        self.topology = topology
         # mininetの初期化
         os.system('sudo mn -c')
         # mininetインスタンスの作成
@@ -50,90 +137,110 @@ class L2Network:
         self.c0 = self.net.addController('c0', port=PORT)
         self.list_switch = []
         self.list_host = []
-        self.traffic = {}
+        # node名 → mininetのSwitch・Host
+        self.mininet_nodes = {}
+        # 通信中のトラフィック（送信元ごと・送信元と宛先の組ごとに管理）
+        self.traffic = TrafficRegistry()
+        # フローコントローラーのREST APIのクライアント
+        self.client = ControllerClient()
+        # トラフィックごとの結果の書き込み
+        self.result_writer = ResultWriter(RESULT_FILE)
 
         # neo4jのインスタンス化とDBのクリア
         self.graph = Graph(password=DB_PASS)
+        # node名 → neo4jのnodeのid
+        self.neo4j_nodes = {}
         self._delete_neo2j_graph()
 
     def _delete_neo2j_graph(self):
         '''
         neo4jのDBのデータを削除
+        一度に削除するnode数をNEO4J_BATCH_SIZEまでに抑え、削除するnodeがなくなるまで繰り返す
+        '''
+        string = (
+            'MATCH (n) WHERE n:switch OR n:host '
+            'WITH n LIMIT $limit '
+            'DETACH DELETE n '
+            'RETURN count(*)'
+        )
+        while self.graph.evaluate(string, limit=NEO4J_BATCH_SIZE):
+            pass
+        self.neo4j_nodes = {}
+
+    def _create_neo4j_graph(self):
         '''
-        # SwitchとRelationを削除
-        self.graph.run("MATCH (n:switch) OPTIONAL MATCH (n)-[r]-() DELETE r,n;")
-        # NodeとRelationを削除
-        self.graph.run("MATCH (n:host) OPTIONAL MATCH (n)-[r]-() DELETE r,n;")
+        neo4jにSwitch・Host・リンクを登録
+        UNWINDでNEO4J_BATCH_SIZEずつまとめて作成し、リンクは作成時に取得したnodeのidで接続する
+        '''
+        tx = self.graph.begin()
+        # Switch・Hostを作成し、node名 → neo4jのnodeのidを保持
+        for label, nodes in (("switch", self.topology.switches), ("host", self.topology.hosts)):
+            string = (
+                'UNWIND $rows AS row '
+                f'CREATE (n:{label} {{name: row.name}}) '
+                'RETURN row.name AS name, id(n) AS id'
+            )
+            for rows in self.__chunks([{"name": node["name"]} for node in nodes]):
+                for record in tx.run(string, rows=rows).data():
+                    self.neo4j_nodes[record["name"]] = record["id"]
+        # networkで定義している接続情報からリンクを作成
+        string = (
+            'UNWIND $rows AS row '
+            'MATCH (a) WHERE id(a) = row.node1 '
+            'MATCH (b) WHERE id(b) = row.node2 '
+            'CREATE (a)-[:connect {bandwidth: row.bandwidth}]->(b)'
+        )
+        rows = [
+            {"node1": self.neo4j_nodes[link[0]], "node2": self.neo4j_nodes[link[2]], "bandwidth": 100}
+            for link in self.topology.links
+        ]
+        for chunk in self.__chunks(rows):
+            tx.run(string, rows=chunk)
+        # Commit
+        tx.commit()
+
+    @staticmethod
+    def __chunks(rows):
+        for i in range(0, len(rows), NEO4J_BATCH_SIZE):
+            yield rows[i:i + NEO4J_BATCH_SIZE]
 
     def create_network(self):
         '''
         mininetのネットワークを作成
         '''
-        # neo4jのトランザクション開始
-        tx = self.graph.begin()
         # Switchを作成
-        for i in range(NUM_SWITCH):
-            sw_name = SWITCH_LIST[i]["name"]
+        for switch in self.topology.switches:
+            sw_name = switch["name"]
             # mininetにSwitchを登録
             sw = self.net.addSwitch(sw_name)
             # list_switchにSwitchを登録
             self.list_switch.append(sw)
-            # neo4jにSwitchを登録
-            tx.create(Node("switch", name=sw_name))
+            self.mininet_nodes[sw_name] = sw
 
         # Hostを作成
-        for i in range(NUM_HOST):
-            host_name = HOST_LIST[i]["name"]
+        for host_info in self.topology.hosts:
+            host_name = host_info["name"]
             # mininetにHostを登録
-            host = self.net.addHost(host_name)
+            host = self.net.addHost(host_name, ip=host_info["ip"])
             # list_hostにHostを登録
             self.list_host.append(host)
-            # neo4jにHostを登録
-            tx.create(Node("host", name=host_name))
-        # Commit
-        tx.commit()
+            self.mininet_nodes[host_name] = host
 
-         # 100Mbpsのリンクを定義
+        # 100Mbpsのリンクを定義
         Band1mTCLink = custom(TCLink, bw=100)
-        # neo4jのトランザクション開始
         # networkで定義している接続情報からリンクを作成
-        tx = self.graph.begin()
-        for link in LINK:
+        for link in self.topology.links:
             # リンク情報からnodeを取得
             nodes = self._link_to_node(link)
             # mininet上のリンクを生成
             li = Band1mTCLink(nodes[0][0], nodes[1][0], port1=int(nodes[0][1]), port2=int(nodes[1][1]))
+            # Hostの接続ポートにmacアドレスを割り当てる
+            for (node, _), intf in zip(nodes, (li.intf1, li.intf2)):
+                if not self.topology.is_switch(node.name):
+                    intf.setMAC(self.topology.nodes[node.name]["mac"])
 
-            # nodes[0]がSwitchの場合
-            if nodes[0][0].name.startswith("s"):
-                # nodes[0]に対応するneo4jインスタンスを取得
-                node1 = self.graph.nodes.match("switch", name=nodes[0][0].name).first()
-            # nodes[0]がHostの場合
-            else:
-                # nodes[0]に対応するneo4jインスタンスを取得
-                node1 = self.graph.nodes.match("host", name=nodes[0][0].name).first()
-                # このnodeの接続ポートにmacアドレスを割り当てる
-                mac = list(filter(lambda x:x["name"] == nodes[0][0].name, HOST_LIST))[0]["mac"]
-                li.intf2.setMAC(mac)
-            # nodes[1]がSwitchの場合
-            if nodes[1][0].name.startswith("s"):
-                # node[1]に対応するneo4jインスタンスを取得
-                node2 = self.graph.nodes.match("switch", name=nodes[1][0].name).first()
-            # nodes[1]がHostの場合
-            else:
-                # node[1]に対応するneo4jインスタンスを取得
-                node2 = self.graph.nodes.match("host", name=nodes[1][0].name).first()
-                # このnodeの接続ポートにmacアドレスを割り当てる
-                mac = list(filter(lambda x:x["name"] == nodes[1][0].name, HOST_LIST))[0]["mac"]
-                li.intf2.setMAC(mac)
-
-            # neo4j上のリンクを生成
-            relation = dict(bandwidth=100)
-            node1to2 = Relationship(node1, "connect", node2, **relation)
-            tx.create(node1to2)
-
-        # Commit
-        tx.commit()
+        # neo4jにSwitch・Host・リンクを登録
+        self._create_neo4j_graph()
 
         for host in self.list_host:
             # Hostでiperfサーバを起動
@@ -146,12 +253,9 @@ class L2Network:
         '''
         nodes = []
         for node in [[link[0], link[1]], [link[2], link[3]]]:
-            if node[0].startswith("s"):
-                nodes.append([self.list_switch[int(node[0][1:]) - 1], node[1]])
-            elif node[0].startswith("h"):
-                nodes.append([self.list_host[int(node[0][1:]) - 1], node[1]])
-            else:
-                raise Exception
+            if node[0] not in self.mininet_nodes:
+                raise Exception(f"unknown node: {node[0]}")
+            nodes.append([self.mininet_nodes[node[0]], node[1]])
         return nodes
 
 
@@ -177,163 +281,171 @@ class L2Network:
         ネットワークの停止
         '''
         self.net.stop()
+        self.result_writer.close()
 
-    def exec_simulation(self):
+    def exec_simulation(self, workload, num_traffic=NUM_TRAFFIC):
         '''
         シミュレーションの実行
+        workload: トラフィックの発生要求（TrafficRequest）を発生時刻の順に返すiterable
+        num_traffic: 通信を行うトラフィック数。workloadが先に尽きた場合はそこで終了する
+        戻り値: 発生させようとしたトラフィックの発生要求のリスト（トレースファイルに保存して再現に使用する）
+        '''
+        return asyncio.run(self.__run_simulation(workload, num_traffic))
+
+    async def __run_simulation(self, workload, num_traffic):
+        '''
+        トラフィックごとの処理をasyncioのタスクとして実行する
+        コントローラーの呼び出しはイベントループで行い、ブロックするmininetのcmd（iperf）のみをスレッドで実行する
+        送信元は1つのトラフィックのみ送信するため、スレッド数はhost数までとする
         '''
         count = 0
-        future_list = []
-        with futures.ThreadPoolExecutor(max_workers=100) as executor:
-            # ビデオサーバのインスタンスの定義
-            video_server = [0, 10]
-            # 他トラフィックを送信するインスタンスの定義
-            client = [1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 16, 17, 18]
-            
-            # 以下条件を満たすまで繰り返し
-            while count < 100:
-                print(f"count: {count}")
-                flg_skip = False
-                print(self.traffic)
-                # この時点で発生しているトラフィックのリスト
-                traffic_list = list(_key for _key, _val in self.traffic.items() if _val)
-                # ビデオストリームの場合
-                if random.randrange(2) == 0:
-                    try:
-                        _type = "video"
-                        # 通信を行うノードの選択
-                        node1 = video_server[random.randrange(2)]
-                        node2 = client[random.randrange(17)]
-                        # どちらが送信側になるかを選択
-                        start_node, end_node = (node1, node2) if random.randrange(2) == 0 else (node2, node1)
-                        for traffic in traffic_list:
-                            # 送信ノードがすでに他のトラフィックで送信中であればスキップ
-                            if traffic.startswith(f"h{start_node + 1}h"):
-                                print("video skip")
-                                print(traffic_list)
-                                flg_skip = True
-                        # すでにそのノード間で同様の通信が発生していない場合は通信を行う
-                        if not self.traffic.get(f"h{start_node + 1}h{end_node + 1}") and flg_skip == False:
-                            # 通信中のトラフィックとして登録
-                            self.traffic[f"h{start_node + 1}h{end_node + 1}"] = True
-                            # 別スレッドで通信を実行
-                            future = executor.submit(self.__video_traffic, start_node=start_node, end_node=end_node)
-                            future_list.append(future)
-                            count += 1
-                        # 上記以外の場合はスキップ
-                        else:
-                            print("video skip2")
-                            pass
-                            # print("hige")
-                    except BaseException as e:
-                        print(e)
-                # 他トラフィックの場合
-                else:
-                    try:
-                        _type = "other"
-                        # 通信を行うノードの選択
-                        client_tmp = copy.deepcopy(client)
-                        tmp = random.randrange(17)
-                        start_node = client_tmp[tmp]
-                        del client_tmp[tmp]
-                        end_node = client_tmp[random.randrange(16)]
-                        for traffic in traffic_list:
-                            # 送信ノードがすでに他のトラフィックで送信中であればスキップ
-                            if traffic.startswith(f"h{start_node + 1}h"):
-                                print("other skip")
-                                print(traffic_list)
-                                flg_skip = True
-                        # すでにそのノード間で同様の通信が発生していない場合は通信を行う
-                        if not self.traffic.get(f"h{start_node + 1}h{end_node + 1}") and flg_skip == False:
-                            # 通信中のトラフィックとして登録
-                            self.traffic[f"h{start_node + 1}h{end_node + 1}"] = True
-                            # 別スレッドで通信を実行
-                            future = executor.submit(self.__other_traffic, start_node=start_node, end_node=end_node)
-                            future_list.append(future)
-                            count += 1
-                        else:
-                            # 上記以外の場合はスキップ
-                            print("other skip2")
-                            pass
-                            # print("huge")
-                    except BaseException as e:
-                        print(e)
-                # 通信間隔を1秒開ける
-                time.sleep(1)
-            _ = futures.as_completed(fs=future_list)
-
-
-
-    def __video_traffic(self, start_node, end_node):
+        tasks = []
+        offered = []
+        started = time.monotonic()
+        with futures.ThreadPoolExecutor(max_workers=len(self.list_host)) as executor:
+            try:
+                # 以下条件を満たすまで繰り返し
+                for request in workload:
+                    if count >= num_traffic:
+                        break
+                    # 発生時刻まで待つ
+                    wait = started + request.at - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    offered.append(request)
+                    print(f"count: {count}")
+                    start_node, end_node = request.start_node, request.end_node
+                    # 送信ノードがすでに他のトラフィックで送信中、またはそのノード間で通信中であればスキップ
+                    # 判定と通信中のトラフィックとしての登録はまとめて行う
+                    reason = self.traffic.reserve(f"h{start_node + 1}", f"h{end_node + 1}")
+                    if reason:
+                        print(f"{request.type} skip: {reason}")
+                        continue
+                    if request.type == "video":
+                        coroutine = self.__video_traffic(executor, start_node, end_node,
+                                                         request.stream_rate, request.stream_period)
+                    else:
+                        coroutine = self.__other_traffic(executor, start_node, end_node, request.data_size)
+                    tasks.append(asyncio.create_task(coroutine))
+                    count += 1
+                await asyncio.gather(*tasks)
+            finally:
+                await self.client.close()
+        print(self.traffic.get_stats())
+        return offered
+
+    async def __video_traffic(self, executor, start_node, end_node, stream_rate, stream_period):
         '''
         ビデオストリーム通信の実行
         '''
+        src_host, dst_host = f"h{start_node + 1}", f"h{end_node + 1}"
         print(f"start video. start_node: {start_node + 1}, end_node: {end_node + 1}")
         try:
-            payload = {"src_host": f"h{start_node + 1}", "dst_host": f"h{end_node + 1}"}
             print(f"updating flow table for video. start_node: {start_node + 1}, end_node: {end_node + 1}")
             # フローをアップデート
-            res = requests.post(VIDEO_TRAFFIC_FLOW_UPDATE, data=json.dumps(payload))
+            requested = time.time()
+            res = await self.client.update_flow("video", src_host, dst_host)
+            started = time.time()
             # フローのアップデートを失敗した場合
-            if res.json()["result"] == "fail":
-                # ログの書き込み
-                self.list_host[start_node].cmd(f"echo failed video stream >> {LOG_DIR}/result-video-h{start_node + 1}-h{end_node + 1}.txt")
+            if res["result"] == "fail":
+                # 結果の書き込み
+                self.result_writer.write(create_record("video", src_host, dst_host, started, started, "fail",
+                                                       started - requested))
                 # 通信中のトラフィックから削除
-                self.traffic[f"h{start_node + 1}h{end_node + 1}"] = False
+                self.traffic.release(src_host, dst_host)
                 print(f"end video. start_node: {start_node + 1}, end_node: {end_node + 1}")
                 return
-            # 通信レートと通信時間を設定
-            stream_rate = random.randrange(10, 30)
-            stream_period = random.randrange(1, 20)
             print(f"sending traffic for video. start_node: {start_node + 1}, end_node: {end_node + 1}")
-            # 通信の発生
-            self.list_host[start_node].cmd(f"iperf -c 10.0.0.{end_node + 1} -u -b {stream_rate}M -t {stream_period}")
+            # 通信の発生（IPERF_INTERVAL秒ごとの送信速度と、サーバレポートのjitter・損失率をcsvで取得）
+            output = await self.__cmd(executor, start_node,
+                                      f"iperf -c {self.topology.hosts[end_node]['ip']} -u -b {stream_rate}M -t {stream_period}"
+                                      f" -y C -i {IPERF_INTERVAL}")
+            report = parse_iperf_csv(output)
             print(f"update result file for video. start_node: {start_node + 1}, end_node: {end_node + 1}")
-            # ログの書き込み
-            self.list_host[start_node].cmd(f"echo success video stream >> {LOG_DIR}/result-video-h{start_node + 1}-h{end_node + 1}.txt")
-        except BaseException as e:
+            # 結果の書き込み
+            self.result_writer.write(create_record(
+                "video", src_host, dst_host, started, time.time(), "success", started - requested,
+                report["bytes"], res.get("path"), report["duration"] or None,
+                stream_rate=stream_rate, jitter=report["jitter"], loss=report["loss"], intervals=report["intervals"]
+            ))
+            # ビデオトラフィックの完了処理
+            res = await self.client.complete_video_traffic(src_host, dst_host)
+        except Exception as e:
             print(f"occur error video traffic. start_node: {start_node + 1}, end_node: {end_node + 1}, error: {e}")
         print(f"end video. start_node: {start_node + 1}, end_node: {end_node + 1}")
         # 通信中のトラフィックから削除
-        self.traffic[f"h{start_node + 1}h{end_node + 1}"] = False
+        self.traffic.release(src_host, dst_host)
 
-    def __other_traffic(self, start_node, end_node):
+    async def __other_traffic(self, executor, start_node, end_node, data_size):
         '''
         他トラフィック通信の実行
         '''
+        src_host, dst_host = f"h{start_node + 1}", f"h{end_node + 1}"
         print(f"start other. start_node: {start_node + 1}, end_node: {end_node + 1}")
         try:
-            payload = {"src_host": f"h{start_node + 1}", "dst_host": f"h{end_node + 1}"}
             print(f"updating flow table for other. start_node: {start_node + 1}, end_node: {end_node + 1}")
             # フローをアップデート
-            res = requests.post(OTHER_TRAFFIC_FLOW_UPDATE, data=json.dumps(payload))
+            requested = time.time()
+            res = await self.client.update_flow("other", src_host, dst_host)
+            started = time.time()
             # フローのアップデートを失敗した場合
-            if res.json()["result"] == "fail":
-                # ログの書き込み
-                self.list_host[start_node].cmd(f"echo failed other stream >> {LOG_DIR}/result-other-h{start_node + 1}-h{end_node + 1}.txt")
+            if res["result"] == "fail":
+                # 結果の書き込み
+                self.result_writer.write(create_record("other", src_host, dst_host, started, started, "fail",
+                                                       started - requested))
                 # 通信中のトラフィックから削除
-                self.traffic[f"h{start_node + 1}h{end_node + 1}"] = False
+                self.traffic.release(src_host, dst_host)
                 print(f"end other. start_node: {start_node + 1}, end_node: {end_node + 1}")
                 return
-            # 通信データ量の設定
-            data_size = random.randrange(100, 900)
             print(f"sending traffic for other. start_node: {start_node + 1}, end_node: {end_node + 1}")
-            # 通信の発生
-            self.list_host[start_node].cmd(f"iperf -c 10.0.0.{end_node + 1} -n {data_size}M | grep sec >> {LOG_DIR}/result-other-h{start_node + 1}-h{end_node + 1}.txt")
+            # 通信の発生（IPERF_INTERVAL秒ごとの転送速度をcsvで取得）
+            output = await self.__cmd(executor, start_node,
+                                      f"iperf -c {self.topology.hosts[end_node]['ip']} -n {data_size}M -y C -i {IPERF_INTERVAL}")
+            report = parse_iperf_csv(output)
+            # 結果の書き込み
+            self.result_writer.write(create_record(
+                "other", src_host, dst_host, started, time.time(), "success", started - requested,
+                report["bytes"], res.get("path"), report["duration"] or None, intervals=report["intervals"]
+            ))
             print(f"complete traffic for othe. start_node: {start_node + 1}, end_node: {end_node + 1}")
             # 他トラフィックの完了処理
-            res = requests.post(OTHER_TRAFFIC_FLOW_COMPLETE, data=json.dumps(payload))
-        except BaseException as e:
+            res = await self.client.complete_other_traffic(src_host, dst_host)
+        except Exception as e:
             print(f"occur error other traffic. start_node: {start_node + 1}, end_node: {end_node + 1}, error: {e}")
         print(f"end other. start_node: {start_node + 1}, end_node: {end_node + 1}")
         # 通信中のトラフィックから削除
-        self.traffic[f"h{start_node + 1}h{end_node + 1}"] = False
+        self.traffic.release(src_host, dst_host)
+
+    async def __cmd(self, executor, node, command):
+        '''
+        hostでコマンドを実行して出力を取得する。mininetのcmdはブロックするためexecutorのスレッドで実行する
+        '''
+        return await asyncio.get_running_loop().run_in_executor(executor, self.list_host[node].cmd, command)
 
 
 if '__main__' == __name__:
 
+    parser = argparse.ArgumentParser(description="Mininetを使用したシミュレーション")
+    parser.add_argument("--traffic", type=int, default=NUM_TRAFFIC, help="通信を行うトラフィック数")
+    parser.add_argument("--arrival", default="fixed", choices=["fixed", "poisson"], help="トラフィックの発生間隔の分布")
+    parser.add_argument("--inter-arrival", type=float, default=1, help="トラフィックの発生間隔（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace", default=None, help="再現するトレースファイル")
+    args = parser.parse_args()
+
+    # 環境変数TOPOLOGYで指定されたトポロジ（コントローラーも同じ環境変数で起動する）
+    topology = load_topology()
+
+    if args.trace:
+        # トレースファイルのトラフィックを同じ時刻で再現する
+        params, workload = load_trace(args.trace)
+    else:
+        generator = Workload(args.arrival, args.inter_arrival, video_server=topology.video_server,
+                             client=topology.client, seed=args.seed)
+        params, workload = generator.get_params(), generator
+
     # ネットワーク初期化
-    l2net = L2Network()
+    l2net = L2Network(topology)
     # ネットワークの作成
     l2net.create_network()
     # ネットワークの開始
@@ -341,7 +453,9 @@ if '__main__' == __name__:
     # コントローラを手動開始するためにインタラクションを挿入
     input()
     # シミュレーションの開始
-    l2net.exec_simulation()
+    offered = l2net.exec_simulation(workload, args.traffic)
+    # 発生させたトラフィックをトレースファイルに保存（結果フォルダはanalysis.shで集計するため、その外に保存）
+    save_trace(f"{LOG_DIR}.trace", offered, params)
     # ネットワークの終了
     l2net.stop_network()
 
@@ -0,0 +1,77 @@
+import threading
+from collections import defaultdict
+
+# トラフィックをスキップした理由
+SKIP_PAIR_ACTIVE = "pair_active"
+SKIP_SENDER_BUSY = "sender_busy"
+
+
+class TrafficRegistry:
+    '''
+    通信中のトラフィックを送信元ごと・送信元と宛先の組ごとに管理する
+    発生時の判定・登録・削除はいずれもO(1)で、終了したトラフィックは削除して保持しない
+    複数のスレッドから呼び出されるため、判定と登録・削除はロックで排他する
+    '''
+
+    def __init__(self):
+        '''
+        初期化
+        '''
+        self.lock = threading.Lock()
+        # 送信元 → 通信中の宛先の集合
+        self.senders = {}
+        # 通信中の(送信元, 宛先)の集合
+        self.pairs = set()
+        # スキップした理由 → 件数
+        self.skipped = defaultdict(int)
+        self.reserved = 0
+        self.released = 0
+
+    def reserve(self, src_host, dst_host):
+        '''
+        送信元が送信中でなく、そのノード間で通信中でもなければ通信中として登録する
+        戻り値: 登録した場合はNone、スキップした場合はその理由
+        '''
+        with self.lock:
+            if (src_host, dst_host) in self.pairs:
+                reason = SKIP_PAIR_ACTIVE
+            elif src_host in self.senders:
+                reason = SKIP_SENDER_BUSY
+            else:
+                self.senders[src_host] = {dst_host}
+                self.pairs.add((src_host, dst_host))
+                self.reserved += 1
+                return None
+            self.skipped[reason] += 1
+            return reason
+
+    def release(self, src_host, dst_host):
+        '''
+        通信中のトラフィックから削除する
+        戻り値: 登録されていた場合はTrue
+        '''
+        with self.lock:
+            if (src_host, dst_host) not in self.pairs:
+                return False
+            self.pairs.remove((src_host, dst_host))
+            destinations = self.senders[src_host]
+            destinations.discard(dst_host)
+            if not destinations:
+                del self.senders[src_host]
+            self.released += 1
+            return True
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def get_stats(self):
+        '''
+        通信中のトラフィック数・登録と削除の回数・スキップした理由ごとの件数を取得する
+        '''
+        with self.lock:
+            return {
+                "active": len(self.pairs),
+                "reserved": self.reserved,
+                "released": self.released,
+                "skipped": dict(self.skipped)
+            }
@@ -0,0 +1,166 @@
+import gzip
+import json
+import random
+from collections import namedtuple
+
+# ビデオサーバと他トラフィックを送信するインスタンスの定義（ホストのindex）
+VIDEO_SERVER = [0, 10]
+CLIENT = [1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 16, 17, 18]
+
+# トラフィックの発生要求
+# at: シミュレーション開始からの発生時刻（秒）
+# type: "video" または "other"
+# start_node / end_node: 送信側・受信側のホストのindex
+# stream_rate / stream_period: ビデオストリームのレート（Mbps）と通信時間（秒）。他トラフィックは0
+# data_size: 他トラフィックのデータ量（MB）。ビデオストリームは0
+TrafficRequest = namedtuple("TrafficRequest",
+                            ["at", "type", "start_node", "end_node", "stream_rate", "stream_period", "data_size"])
+
+# トレースファイルの各行でのトラフィック種別の表記
+TYPE_CODES = {"video": "v", "other": "o"}
+
+
+def sample(rng, distribution):
+    '''
+    分布の定義から値を1つ生成する
+    distribution: (分布名, パラメータ...) のタプル
+      ("constant", 値)
+      ("randrange", 下限, 上限)（上限を含まない整数。既存のシミュレーションと同じ）
+      ("uniform", 下限, 上限)
+      ("exponential", 平均)
+      ("pareto", 形状, 最小値)
+      ("lognormal", mu, sigma)
+    '''
+    name, *params = distribution
+    if name == "constant":
+        return params[0]
+    if name == "randrange":
+        return rng.randrange(*params)
+    if name == "uniform":
+        return rng.uniform(*params)
+    if name == "exponential":
+        return rng.expovariate(1 / params[0])
+    if name == "pareto":
+        return params[1] * rng.paretovariate(params[0])
+    if name == "lognormal":
+        return rng.lognormvariate(*params)
+    raise ValueError(f"unknown distribution: {name}")
+
+
+class Workload:
+    '''
+    シミュレーションで発生させるトラフィックの列を生成する
+    同じseedとパラメータからは常に同じトラフィックの列が生成される
+    '''
+
+    def __init__(self, arrival="fixed", inter_arrival=1, video_ratio=0.5,
+                 stream_rate=("randrange", 10, 30), stream_period=("randrange", 1, 20),
+                 data_size=("randrange", 100, 900),
+                 video_server=VIDEO_SERVER, client=CLIENT, seed=None):
+        '''
+        初期化
+        arrival: 発生間隔の分布。"fixed"はinter_arrival秒ごと、"poisson"は平均inter_arrival秒のポアソン到着
+        video_ratio: ビデオストリームを発生させる確率
+        stream_rate / stream_period / data_size: sample()に渡す分布の定義
+        seed: 乱数のseed。Noneの場合は生成してself.seedに保持する
+        '''
+        if arrival not in ("fixed", "poisson"):
+            raise ValueError(f"unknown arrival: {arrival}")
+        self.arrival = arrival
+        self.inter_arrival = inter_arrival
+        self.video_ratio = video_ratio
+        self.stream_rate = tuple(stream_rate)
+        self.stream_period = tuple(stream_period)
+        self.data_size = tuple(data_size)
+        self.video_server = list(video_server)
+        self.client = list(client)
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+
+    def __iter__(self):
+        '''
+        トラフィックの発生要求を発生時刻の順に無限に生成する
+        '''
+        rng = random.Random(self.seed)
+        num_client = len(self.client)
+        at = 0
+        while True:
+            if rng.random() < self.video_ratio:
+                node1 = self.video_server[rng.randrange(len(self.video_server))]
+                node2 = self.client[rng.randrange(num_client)]
+                # どちらが送信側になるかを選択
+                start_node, end_node = (node1, node2) if rng.randrange(2) == 0 else (node2, node1)
+                yield TrafficRequest(at, "video", start_node, end_node,
+                                     sample(rng, self.stream_rate), sample(rng, self.stream_period), 0)
+            else:
+                # 送信側と異なる受信側を選択
+                i = rng.randrange(num_client)
+                j = rng.randrange(num_client - 1)
+                if j >= i:
+                    j += 1
+                yield TrafficRequest(at, "other", self.client[i], self.client[j], 0, 0, sample(rng, self.data_size))
+            if self.arrival == "poisson":
+                at += rng.expovariate(1 / self.inter_arrival)
+            else:
+                at += self.inter_arrival
+
+    def get_params(self):
+        '''
+        トレースファイルのヘッダに記録するパラメータを取得する
+        '''
+        return {
+            "arrival": self.arrival,
+            "inter_arrival": self.inter_arrival,
+            "video_ratio": self.video_ratio,
+            "stream_rate": list(self.stream_rate),
+            "stream_period": list(self.stream_period),
+            "data_size": list(self.data_size),
+            "video_server": self.video_server,
+            "client": self.client,
+            "seed": self.seed
+        }
+
+
+def save_trace(path, requests_list, params=None):
+    '''
+    トラフィックの発生要求の列をトレースファイルに保存する
+    1行目は生成に使用したパラメータのjson、以降は1行に1トラフィックをタブ区切りで記録する
+    pathが.gzで終わる場合はgzipで圧縮する
+    '''
+    with _open(path, "wt") as f:
+        f.write(json.dumps(params or {}) + "\n")
+        for r in requests_list:
+            if r.type == "video":
+                values = (r.stream_rate, r.stream_period)
+            else:
+                values = (r.data_size,)
+            f.write("\t".join([repr(r.at), TYPE_CODES[r.type], str(r.start_node), str(r.end_node)] + [repr(v) for v in values]) + "\n")
+
+
+def load_trace(path):
+    '''
+    トレースファイルを読み込む
+    戻り値: (パラメータ, トラフィックの発生要求のリスト)
+    '''
+    types = {code: name for name, code in TYPE_CODES.items()}
+    requests_list = []
+    with _open(path, "rt") as f:
+        params = json.loads(f.readline())
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 5:
+                continue
+            traffic_type = types[fields[1]]
+            at, start_node, end_node = float(fields[0]), int(fields[2]), int(fields[3])
+            if traffic_type == "video":
+                requests_list.append(TrafficRequest(at, traffic_type, start_node, end_node, _number(fields[4]), _number(fields[5]), 0))
+            else:
+                requests_list.append(TrafficRequest(at, traffic_type, start_node, end_node, 0, 0, _number(fields[4])))
+    return params, requests_list
+
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def _number(value):
+    return float(value) if "." in value or "e" in value else int(value)